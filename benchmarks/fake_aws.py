@@ -0,0 +1,339 @@
+import asyncio
+import collections
+import fnmatch
+import random
+import threading
+import time
+
+account = "123456789012" # Account ID returned by the simulated STS
+default_page_size = 100 # Items per page if the caller does not ask for a page size
+
+# Listing operations, the stores holding the listed items and the key of the items in the response
+_listings = {
+    'GetRestApis': [('apigateway', 'items')],
+    'ListProjects': [('codebuild', 'projects')],
+    'ListTables': [('dynamodb', 'TableNames')],
+    'GetConnections': [('glue_conn', 'ConnectionList')],
+    'GetCrawlers': [('glue_crawlers', 'Crawlers')],
+    'GetDatabases': [('glue_db', 'DatabaseList')],
+    'GetJobs': [('glue_jobs', 'Jobs')],
+    'GetAccountAuthorizationDetails': [('iam_roles', 'RoleDetailList'), ('iam_policies', 'Policies')],
+    'ListRoles': [('iam_roles', 'Roles')],
+    'ListPolicies': [('iam_policies', 'Policies')],
+    'ListFunctions': [('lambda', 'Functions')],
+    'ListBuckets': [('s3', 'Buckets')],
+    'ListStateMachines': [('sfn', 'stateMachines')],
+}
+
+# Removal operations, the store holding the removed item and the parameter identifying it
+_removals = {
+    'DeleteRestApi': ('apigateway', 'restApiId'),
+    'DeleteProject': ('codebuild', 'name'),
+    'DeleteTable': ('dynamodb', 'TableName'),
+    'DeleteConnection': ('glue_conn', 'ConnectionName'),
+    'DeleteCrawler': ('glue_crawlers', 'Name'),
+    'DeleteDatabase': ('glue_db', 'Name'),
+    'DeleteJob': ('glue_jobs', 'JobName'),
+    'DeleteRole': ('iam_roles', 'RoleName'),
+    'DeletePolicy': ('iam_policies', 'PolicyArn'),
+    'DeleteFunction': ('lambda', 'FunctionName'),
+    'DeleteBucket': ('s3', 'Bucket'),
+    'DeleteStateMachine': ('sfn', 'stateMachineArn'),
+}
+
+# Drivers and the stores holding their resources
+drivers = {
+    'apigateway': ['apigateway'],
+    'codebuild': ['codebuild'],
+    'dynamodb': ['dynamodb'],
+    'ec2': ['ec2'],
+    'glue_conn': ['glue_conn'],
+    'glue_crawlers': ['glue_crawlers'],
+    'glue_db': ['glue_db'],
+    'glue_jobs': ['glue_jobs'],
+    'iam': ['iam_roles', 'iam_policies'],
+    'lambda': ['lambda'],
+    's3': ['s3'],
+    'sfn': ['sfn'],
+}
+
+# Throttling error codes returned by the services, ThrottlingException for the others
+_throttling_errors = {
+    'ec2': 'RequestLimitExceeded',
+    'iam': 'Throttling',
+    's3': 'SlowDown',
+}
+
+def _item(store, name, i):
+    "Returns the key and the listed item of the resource"
+    if store == 'apigateway':
+        key = "a%09d" % (i)
+        return key, {'name': name, 'id': key}
+    if store in ('codebuild', 'dynamodb'):
+        return name, name
+    if store in ('glue_conn', 'glue_crawlers', 'glue_db', 'glue_jobs', 's3'):
+        return name, {'Name': name}
+    if store == 'ec2':
+        key = "i-%017x" % (i)
+        return key, {
+            'InstanceId': key,
+            'State': {'Name': 'running'},
+            'Tags': [{'Key': 'Name', 'Value': name}]
+        }
+    if store == 'iam_roles':
+        return name, {
+            'RoleName': name,
+            'Arn': "arn:aws:iam::%s:role/%s" % (account, name),
+            'AttachedManagedPolicies': [{'PolicyArn': "arn:aws:iam::aws:policy/ReadOnlyAccess"}],
+            'RolePolicyList': [{'PolicyName': name}],
+            'InstanceProfileList': [],
+        }
+    if store == 'iam_policies':
+        key = "arn:aws:iam::%s:policy/%s" % (account, name)
+        return key, {
+            'PolicyName': name,
+            'Arn': key,
+            'PolicyVersionList': [
+                {'VersionId': 'v1', 'IsDefaultVersion': False},
+                {'VersionId': 'v2', 'IsDefaultVersion': True},
+            ],
+        }
+    if store == 'lambda':
+        return name, {'FunctionName': name}
+    if store == 'sfn':
+        key = "arn:aws:states:us-east-1:%s:stateMachine:%s" % (account, name)
+        return key, {'name': name, 'stateMachineArn': key}
+    raise ValueError("Unknown store %s" % (store))
+
+class failure(Exception):
+    "Error response of a simulated call"
+
+    def __init__(self, code, status_code=400):
+        "Constructor"
+        Exception.__init__(self, code)
+        self.code = code
+        self.status_code = status_code
+
+class response(object):
+    "HTTP response of a simulated call"
+
+    def __init__(self, status_code=200, content=b''):
+        "Constructor"
+        self.status_code = status_code
+        self.headers = {}
+        self.content = content
+
+class backend(object):
+    "Simulated AWS account answering client calls in process, through botocore event hooks"
+
+    def __init__(self, latency=0.0, page_size=None, throttle=0.0, objects=0, seed=0):
+        "Constructor"
+        # Seconds every call takes
+        self.latency = latency
+        # Maximum number of items per page, requested page sizes above it are cut down
+        self.page_size = page_size
+        # Probability of a call being throttled
+        self.throttle = throttle
+        # Number of object versions in every S3 bucket
+        self.objects = objects
+        self.random = random.Random(seed)
+        self.stores = collections.defaultdict(collections.OrderedDict)
+        self.versions = {}
+        self.calls = collections.Counter()
+        self.throttled = collections.Counter()
+        self.lock = threading.Lock()
+        self.paginators = {}
+
+    def populate(self, driver, count, prefix="bench"):
+        "Add count resources of the driver named <prefix>-<number>"
+        with self.lock:
+            for store in drivers[driver]:
+                start = len(self.stores[store])
+                for i in range(start, start + count):
+                    name = "%s-%06d" % (prefix, i)
+                    key, item = _item(store, name, i)
+                    self.stores[store][key] = (name, item)
+                    if store == 's3':
+                        self.versions[key] = collections.OrderedDict(
+                            ("o%06d" % (j), {'Key': "o%06d" % (j), 'VersionId': '1'}) for j in range(self.objects)
+                        )
+                if store == 'ec2':
+                    # Instances without a Name tag are never listed, whatever the patterns
+                    for tags in (None, [{'Key': 'env', 'Value': prefix}]):
+                        key = "i-f%016x" % (len(self.stores[store]))
+                        item = {'InstanceId': key, 'State': {'Name': 'running'}}
+                        if tags is not None:
+                            item['Tags'] = tags
+                        self.stores[store][key] = ('', item)
+        return count
+
+    def reset(self):
+        "Remove all resources and forget the calls made"
+        with self.lock:
+            self.stores.clear()
+            self.versions.clear()
+            self.calls.clear()
+            self.throttled.clear()
+        return self
+
+    def count(self, driver, prefix=""):
+        "Returns the number of resources of the driver left with name starting with the prefix"
+        with self.lock:
+            return sum(
+                1 for store in drivers[driver] for name, item in self.stores[store].values()
+                if name.startswith(prefix)
+            )
+
+    def install(self):
+        "Answer calls of every client created by terminator.clients with this backend"
+        from terminator import clients
+        clients.add_hook('before-parameter-build', self.stash)
+        clients.add_hook('before-call', self.respond)
+        return self
+
+    def stash(self, params, context, **kwargs):
+        "Keep the call parameters, the before-call event only gets them serialized"
+        context['benchmark_params'] = dict(params)
+
+    def respond(self, model, params, context, **kwargs):
+        "Answer the call instead of sending it, after the simulated latency"
+        delay, out = self.call(model.service_model.service_name, model.name, context.get('benchmark_params', {}))
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            time.sleep(delay)
+            return out
+        return self.respond_later(delay, out)
+
+    async def respond_later(self, delay, out):
+        "Answer the call of async client without blocking the event loop"
+        await asyncio.sleep(delay)
+        return out
+
+    def call(self, service, operation, params):
+        "Returns the delay and the (response, parsed response) tuple of the call"
+        delay = self.latency
+        with self.lock:
+            self.calls[operation] += 1
+            throttled = self.throttle and self.random.random() < self.throttle
+            if throttled:
+                self.throttled[operation] += 1
+                if operation in _listings or operation in ('DescribeInstances', 'ListObjectVersions'):
+                    # Listings are retried by botocore, the retry only costs time
+                    delay += self.latency
+                    throttled = False
+            try:
+                if throttled:
+                    raise failure(_throttling_errors.get(service, 'ThrottlingException'))
+                return delay, (response(), self.handle(service, operation, params))
+            except KeyError:
+                e = failure('ResourceNotFoundException', 404)
+            except failure as failed:
+                e = failed
+        return delay, (response(e.status_code), {'Error': {'Code': e.code, 'Message': e.code}})
+
+    def handle(self, service, operation, params):
+        "Returns the parsed response of the call, the caller holds the lock"
+        if operation in _listings:
+            return self.page(service, operation, params, [
+                (key, item) for store, key in _listings[operation] for name, item in self.stores[store].values()
+            ])
+        if operation in _removals:
+            store, param = _removals[operation]
+            del self.stores[store][params[param]]
+            if store == 's3':
+                del self.versions[params[param]]
+            return {}
+        if operation == 'DescribeInstances':
+            return self.page(service, operation, params, [
+                ('Reservations', {'Instances': [item]}) for item in self.instances(params.get('Filters', []))
+            ])
+        if operation == 'TerminateInstances':
+            for instance_id in params['InstanceIds']:
+                if instance_id not in self.stores['ec2']:
+                    raise failure('InvalidInstanceID.NotFound')
+            if params.get('DryRun'):
+                raise failure('DryRunOperation', 412)
+            for instance_id in params['InstanceIds']:
+                del self.stores['ec2'][instance_id]
+            return {'TerminatingInstances': [{'InstanceId': instance_id} for instance_id in params['InstanceIds']]}
+        if operation == 'ListObjectVersions':
+            return self.page(service, operation, params, [
+                ('Versions', item) for item in self.versions[params['Bucket']].values()
+            ])
+        if operation == 'DeleteObjects':
+            versions = self.versions[params['Bucket']]
+            for obj in params['Delete']['Objects']:
+                versions.pop(obj['Key'], None)
+            return {}
+        if operation == 'GetCallerIdentity':
+            return {'Account': account, 'Arn': "arn:aws:iam::%s:user/benchmark" % (account), 'UserId': 'benchmark'}
+        # Detaching and other calls with no result to simulate
+        return {}
+
+    def instances(self, filters):
+        "Returns instances matching the Name tag and instance ID filters"
+        out = []
+        for name, item in self.stores['ec2'].values():
+            matched = True
+            tags = dict((tag['Key'], tag['Value']) for tag in item.get('Tags', []))
+            for f in filters:
+                if f['Name'] == 'tag:Name':
+                    matched = 'Name' in tags and any(fnmatch.fnmatchcase(tags['Name'], value) for value in f['Values'])
+                elif f['Name'] == 'instance-id':
+                    matched = item['InstanceId'] in f['Values']
+                if not matched:
+                    break
+            if matched:
+                out.append(item)
+        return out
+
+    def paginator(self, service, operation):
+        "Returns the botocore pagination config of the operation, or None"
+        key = (service, operation)
+        if key not in self.paginators:
+            import botocore.session
+            try:
+                model = botocore.session.get_session().get_paginator_model(service)
+                self.paginators[key] = model.get_paginator(operation)
+            except Exception:
+                self.paginators[key] = None
+        return self.paginators[key]
+
+    def page(self, service, operation, params, items):
+        "Returns the page of (result key, item) tuples requested by the pagination tokens of the call"
+        config = self.paginator(service, operation)
+        out = {}
+        if config is None:
+            for key, item in items:
+                out.setdefault(key, []).append(item)
+            return out
+
+        input_tokens = config['input_token']
+        if isinstance(input_tokens, str):
+            input_tokens = [input_tokens]
+        output_tokens = config['output_token']
+        if isinstance(output_tokens, str):
+            output_tokens = [output_tokens]
+
+        token = params.get(input_tokens[0])
+        start = int(token.split('-')[-1]) if token else 0
+        size = params.get(config.get('limit_key')) or default_page_size
+        if self.page_size:
+            size = min(size, self.page_size)
+        for key, item in items[start:start + size]:
+            out.setdefault(key, []).append(item)
+
+        result_keys = config['result_key']
+        if isinstance(result_keys, str):
+            result_keys = [result_keys]
+        for key in result_keys:
+            out.setdefault(key, [])
+
+        more = start + size < len(items)
+        if 'more_results' in config:
+            out[config['more_results']] = more
+        if more:
+            for token in output_tokens:
+                out[token] = "page-%09d" % (start + size)
+        return out
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+import builtins
+import contextlib
+import getopt
+import importlib.machinery
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _root)
+
+# Simulated credentials and region, no call leaves the process
+os.environ['AWS_ACCESS_KEY_ID'] = 'benchmark'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'benchmark'
+os.environ.pop('AWS_SESSION_TOKEN', None)
+os.environ.pop('AWS_PROFILE', None)
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import fake_aws
+import terminator as t800
+from terminator import ratelimit
+
+default_count = 1000 # Resources of every driver matching the include pattern
+default_latency = 20.0 # Milliseconds every simulated call takes
+default_repeat = 5 # Cold start of a new interpreter is measured this number of times
+default_tolerance = 0.2 # Timings slower than the baseline by more than this fraction are regressions
+
+_prefix = "bench" # Include pattern of the resources to remove
+_keep_prefix = "keep" # Name prefix of the resources which do not match
+
+def main(argv):
+    "Benchmark routine"
+    settings = {
+        'count': default_count,
+        'keep': 0,
+        'latency': default_latency,
+        'page_size': None,
+        'throttle': 0.0,
+        'objects': 0,
+        'workers': t800.executor.default_workers,
+        'engine': "threads",
+        'repeat': default_repeat,
+    }
+    drivers = t800.get_drivers()
+    output = ""
+    baseline = ""
+    tolerance = default_tolerance
+    run_main = True
+
+    options = ["help", "count=", "keep=", "latency=", "page-size=", "throttle=", "objects=", "workers=", "engine=", "drivers=", "repeat=", "output=", "baseline=", "tolerance=", "skip-main"]
+    try:
+        opts, args = getopt.getopt(argv, "hc:l:w:o:", options)
+    except getopt.GetoptError:
+        print_help()
+        sys.exit(2)
+
+    try:
+        for opt, arg in opts:
+            if opt in ('-h', '--help'):
+                print_help()
+                sys.exit()
+            elif opt in ('-c', '--count'):
+                settings['count'] = int(arg)
+            elif opt == '--keep':
+                settings['keep'] = int(arg)
+            elif opt in ('-l', '--latency'):
+                settings['latency'] = float(arg)
+            elif opt == '--page-size':
+                settings['page_size'] = int(arg)
+            elif opt == '--throttle':
+                settings['throttle'] = float(arg)
+            elif opt == '--objects':
+                settings['objects'] = int(arg)
+            elif opt in ('-w', '--workers'):
+                settings['workers'] = int(arg)
+            elif opt == '--engine':
+                settings['engine'] = arg
+            elif opt == '--drivers':
+                drivers = [driver.strip() for driver in arg.split(',') if driver.strip()]
+            elif opt == '--repeat':
+                settings['repeat'] = int(arg)
+            elif opt in ('-o', '--output'):
+                output = arg
+            elif opt == '--baseline':
+                baseline = arg
+            elif opt == '--tolerance':
+                tolerance = float(arg)
+            elif opt == '--skip-main':
+                run_main = False
+    except ValueError:
+        print_help()
+        sys.exit(2)
+
+    unknown = [driver for driver in drivers if driver not in t800.get_drivers()]
+    if unknown:
+        print("Unknown drivers: %s" % (', '.join(unknown)))
+        sys.exit(2)
+    if settings['engine'] not in ("threads", "asyncio"):
+        print("Engine should be either threads or asyncio")
+        sys.exit(2)
+    if settings['engine'] == "asyncio":
+        import terminator.aio
+        if not t800.aio.available():
+            print("The asyncio engine requires aiobotocore module, install it with 'pip install aiobotocore'")
+            sys.exit(2)
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': settings,
+        'import': time_imports(settings['repeat']),
+    }
+
+    t800.clients.set_pool_size(settings['workers'])
+    t800.executor.set_pool_size(settings['workers'])
+    backend = fake_aws.backend(
+        settings['latency'] / 1000.0,
+        settings['page_size'],
+        settings['throttle'],
+        settings['objects']
+    ).install()
+
+    results['drivers'] = {}
+    for driver in drivers:
+        results['drivers'][driver] = time_driver(backend, driver, settings)
+    if run_main:
+        results['main'] = time_main(backend, drivers, settings)
+
+    data = json.dumps(results, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w") as f:
+            f.write(data + "\n")
+    else:
+        print(data)
+
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(json.load(f), results, tolerance)
+        if regressions:
+            sys.exit(1)
+
+def populate(backend, driver, settings):
+    "Fill the simulated account with resources of the driver"
+    backend.populate(driver, settings['count'], _prefix)
+    if settings['keep']:
+        backend.populate(driver, settings['keep'], _keep_prefix)
+
+def time_imports(repeat):
+    "Returns cold start times of the package import and the command line help in new interpreters"
+    code = "import time; t = time.perf_counter(); import terminator; print(time.perf_counter() - t)"
+    imports = []
+    helps = []
+    for i in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], cwd=_root, capture_output=True, text=True, check=True)
+        imports.append(float(out.stdout))
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(_root, "aws_terminator"), "--help"], cwd=_root, capture_output=True, check=True)
+        helps.append(time.perf_counter() - start)
+    return {
+        'import_seconds': summary(imports),
+        'help_seconds': summary(helps),
+    }
+
+def summary(samples):
+    "Returns the minimum and median of the timing samples"
+    return {'min': min(samples), 'median': statistics.median(samples)}
+
+def reset(backend):
+    "Start a measurement with an empty account and no rates learned by the rate limiter"
+    backend.reset()
+    ratelimit.clear()
+    return backend
+
+def time_driver(backend, driver, settings):
+    "Returns timings of prepare() and process() of the driver removing all matching resources"
+    reset(backend)
+    populate(backend, driver, settings)
+    obj = t800.terminator(driver, [_prefix], [])
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        obj.prepare()
+        prepared = time.perf_counter()
+        listing_calls = sum(backend.calls.values())
+        if settings['engine'] == "asyncio":
+            t800.aio.process_all({obj.region: [obj]}, False)
+        else:
+            t800.process_all({obj.region: [obj]}, False)
+        processed = time.perf_counter()
+
+    out = {
+        'resources': len(obj.report),
+        'errors': len([entry for entry in obj.report if entry.result != "success"]),
+        'left': backend.count(driver, _prefix),
+        'prepare_seconds': prepared - start,
+        'process_seconds': processed - prepared,
+        'prepare_calls': listing_calls,
+        'process_calls': sum(backend.calls.values()) - listing_calls,
+        'throttled': sum(backend.throttled.values()),
+    }
+    print("%-15s %6d resources, prepare %.2fs, process %.2fs" % (driver, out['resources'], out['prepare_seconds'], out['process_seconds']), file=sys.stderr)
+    return out
+
+def load_command():
+    "Returns the aws_terminator script loaded as module"
+    path = os.path.join(_root, "aws_terminator")
+    loader = importlib.machinery.SourceFileLoader("aws_terminator", path)
+    spec = importlib.util.spec_from_loader("aws_terminator", loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+def time_main(backend, drivers, settings):
+    "Returns the timing of the whole command removing resources of all drivers"
+    reset(backend)
+    for driver in drivers:
+        populate(backend, driver, settings)
+    command = load_command()
+    argv = ['--include', _prefix, '--delete', '--workers', str(settings['workers']), '--engine', settings['engine']]
+    argv += ['--' + driver for driver in drivers]
+
+    # The confirmation is answered and the resource list and the report are dropped
+    answer = builtins.input
+    builtins.input = lambda prompt="": "confirm"
+    start = time.perf_counter()
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            command.main(argv)
+    except SystemExit:
+        pass
+    finally:
+        builtins.input = answer
+    elapsed = time.perf_counter() - start
+
+    out = {
+        'seconds': elapsed,
+        'left': dict((driver, backend.count(driver, _prefix)) for driver in drivers),
+        'calls': sum(backend.calls.values()),
+        'throttled': sum(backend.throttled.values()),
+    }
+    print("%-15s %6d resources left, %.2fs" % ("main", sum(out['left'].values()), out['seconds']), file=sys.stderr)
+    return out
+
+def timings(results):
+    "Returns the timings of the results keyed by their path"
+    out = {}
+    for key, value in results['import'].items():
+        out['import.' + key] = value['median']
+    for driver, value in results['drivers'].items():
+        out[driver + '.prepare_seconds'] = value['prepare_seconds']
+        out[driver + '.process_seconds'] = value['process_seconds']
+    if 'main' in results:
+        out['main.seconds'] = results['main']['seconds']
+    return out
+
+def compare(baseline, results, tolerance=default_tolerance):
+    "Print timings compared to the baseline, returns the list of timings slower by more than the tolerance"
+    regressions = []
+    old = timings(baseline)
+    new = timings(results)
+    print("\n%-35s %10s %10s %8s" % ("Timing", "Baseline", "Current", "Ratio"), file=sys.stderr)
+    for key in sorted(new):
+        if key not in old or not old[key]:
+            continue
+        ratio = new[key] / old[key]
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressions.append(key)
+            flag = ' regression'
+        print("%-35s %10.3f %10.3f %8.2f%s" % (key, old[key], new[key], ratio, flag), file=sys.stderr)
+    return regressions
+
+def print_help():
+    "Print help message"
+
+    print("Usage: %s [OPTIONS...]" % __file__)
+    print("\nAvailable options:")
+    print("  -h, --help                 Print this help message")
+    print("  -c, --count <num>          Resources of every driver to remove (default: %d)" % default_count)
+    print("  --keep <num>               Resources of every driver not matching the include pattern (default: 0)")
+    print("  -l, --latency <ms>         Milliseconds every simulated call takes (default: %g)" % default_latency)
+    print("  --page-size <num>          Maximum number of items returned in a single page (default: as requested)")
+    print("  --throttle <fraction>      Fraction of the calls throttled (default: 0)")
+    print("  --objects <num>            Object versions in every S3 bucket (default: 0)")
+    print("  -w, --workers <num>        Number of concurrent workers (default: %d)" % t800.executor.default_workers)
+    print("  --engine <name>            Removal engine, threads (default) or asyncio")
+    print("  --drivers <list>           Comma separated list of drivers to measure (default: all)")
+    print("  --repeat <num>             Number of cold start measurements (default: %d)" % default_repeat)
+    print("  -o, --output <file>        Write results as JSON to <file> instead of stdout")
+    print("  --baseline <file>          Compare timings with results of an earlier run, exit with 1 if any is slower")
+    print("  --tolerance <fraction>     Allowed slowdown compared to the baseline (default: %g)" % default_tolerance)
+    print("  --skip-main                Do not measure the whole command")
+
+if __name__ == "__main__":
+   main(sys.argv[1:])
@@ -1,35 +1,68 @@
-import boto3
 import sys
 import importlib
-import pkgutil
+from terminator import clients
+from terminator import executor
+from terminator import matcher
+from terminator.drivers import manifest
+from terminator.executor import prepare_all, process_all
+from terminator.regions import get_regions, group_by_region
+from terminator import accounts
+from terminator import stats
+from terminator import tagging
+from terminator import waiter
+
+_drivers = sorted(manifest.keys())
+_store_batch = 1000 # Streamed results are dropped from the inventory in batches of this size
 
 def get_drivers():
     "Returns the list of available drivers"
-    out = []
-    _drv = importlib.import_module('terminator.drivers')
-    for importer, modname, ispkg in pkgutil.iter_modules(_drv.__path__):
-        out.append(modname)
-    return out
+    return list(_drivers)
 
 def help_message(driver):
     "Returns the driver's help message"
-    _drv = importlib.import_module('terminator.drivers.'+driver)
-    return _drv.help_string()
+    whitespace_len = 25-len(driver)
+    return "  --%s%s%s" % (driver, ' '*whitespace_len, manifest[driver]['description'])
+
+def make_objects(services, include, exclude, regions=[None], session=None, store=None):
+    "Returns terminator objects for every service and region keyed by (region, service)"
+    out = {}
+    for region in regions:
+        for service in services:
+            obj = terminator(service, include, exclude, region, session, store)
+            # Global services get a single object for all regions
+            out[(obj.region, service)] = obj
+    return out
 
 class terminator(object):
     "The terminator wrapper class"
 
-    def __init__(self, driver, include, exclude):
+    def __init__(self, driver, include, exclude, region=None, session=None, store=None):
         "Constructor"
         self.driver = driver
         self.drv = importlib.import_module('terminator.drivers.'+driver)
         self.include = include
         self.exclude = exclude
+        self.match = matcher.get(include, exclude)
         self.priority = self.drv.priority
+        self.depends = getattr(self.drv, 'depends', [])
+        self.concurrency = getattr(self.drv, 'concurrency', 1)
+        self.regional = getattr(self.drv, 'regional', True)
+        # Global resources are processed once, not in every region
+        self.region = region if self.regional else None
+        self.session = session
+        self.store = store
+        # Journal of completed deletions, set for runs which may be resumed
+        self.journal = None
+        self.resources = []
+        self.report = []
 
     def prepare(self):
         "Prepare the list of resources"
-        self.resources = self.drv.prepare(self.include, self.exclude)
+        with stats.timer(self.driver, 'prepare'):
+            if self.store is not None:
+                self.resources = self.store.prepare(self)
+            else:
+                self.resources = self.drv.prepare(self.match, self.region, self.session)
         return self.resources
 
     def print_prepare_message(self):
@@ -37,6 +70,19 @@ class terminator(object):
         self.drv.print_prepare_message(self.resources)
         return True
 
+    def resource_list(self):
+        "Returns the list of resources, resources grouped by type such as IAM roles and policies are flattened"
+        if isinstance(self.resources, dict):
+            return [res for group in self.resources.values() for res in group]
+        return list(self.resources)
+
+    def set_resources(self, resources):
+        "Set the resources from a flat list, grouping them by type like prepare() if the driver does"
+        if hasattr(self.drv, 'group_resources'):
+            resources = self.drv.group_resources(resources)
+        self.resources = resources
+        return self.resources
+
     def has_resources(self):
         "Return True if object has resources to process"
         if self.resources:
@@ -44,10 +90,40 @@ class terminator(object):
         else:
             return False
 
-    def process(self, dry_run=True):
-        "Process actions"
-        self.report = self.drv.process(self.resources, dry_run)
+    def process(self, dry_run=True, output=None):
+        "Process actions, removing up to the driver's concurrency resources simultaneously, results are written to the output if one is given"
+        workers = min(self.concurrency, executor.get_pool_size())
+        with stats.timer(self.driver, 'process'):
+            results = self.drv.process(self.resources, dry_run, workers, self.region, self.session)
+            if self.journal is not None and not dry_run:
+                results = self.journal.track(self, results)
+            if output is not None:
+                return self.write_results(results, dry_run, output)
+            return self.set_report(list(results), dry_run)
+
+    def set_report(self, report, dry_run=True):
+        "Keep the report, resources removed successfully are dropped from the inventory"
+        self.report = report
+        self.update_store(report, dry_run)
+        return self.report
+
+    def write_results(self, results, dry_run, output):
+        "Write every result to the output as soon as it is produced instead of keeping the report"
+        batch = []
+        for entry in results:
+            output.write(self, entry)
+            batch.append(entry)
+            if len(batch) >= _store_batch:
+                self.update_store(batch, dry_run)
+                batch = []
+        self.update_store(batch, dry_run)
         return self.report
+
+    def update_store(self, report, dry_run=True):
+        "Drop resources removed successfully according to the report from the inventory"
+        if self.store is not None and not dry_run and report:
+            self.store.update(self, report)
+        return True
     
     def print_report(self):
         "Print the report"
@@ -0,0 +1,106 @@
+import terminator
+from terminator import clients
+from terminator import stats
+
+def account_id(role_arn):
+    "Returns the account ID of the role ARN"
+    return role_arn.split(':')[4]
+
+def get_account_id(session=None):
+    "Returns the account ID of the session credentials"
+    client = clients.get_client('sts', None, session)
+    return client.get_caller_identity()['Account']
+
+def assume_role(role_arn, session_name='aws_terminator'):
+    "Returns boto3 session using temporary credentials of the assumed role"
+    import boto3
+    client = clients.get_client('sts')
+    response = client.assume_role(
+        RoleArn=role_arn,
+        RoleSessionName=session_name
+    )
+    credentials = response['Credentials']
+    return boto3.Session(
+        aws_access_key_id=credentials['AccessKeyId'],
+        aws_secret_access_key=credentials['SecretAccessKey'],
+        aws_session_token=credentials['SessionToken']
+    )
+
+def open_inventory(inventory):
+    "Returns the inventory store for the (path, ttl) tuple, or None"
+    if not inventory:
+        return None
+    from terminator.inventory import inventory as store
+    return store(*inventory)
+
+def discover_account(task):
+    "Worker process: assume the role and discover resources, keyed by (region, service)"
+    role_arn, services, include, exclude, regions, workers, tags, inventory = task
+    out = {'Role': role_arn, 'Account': account_id(role_arn), 'Resources': {}, 'Error': '', 'Stats': None}
+    # Worker processes are reused, every task reports only its own calls
+    stats.reset()
+    try:
+        session = assume_role(role_arn)
+        objects = terminator.make_objects(services, include, exclude, regions, session, open_inventory(inventory))
+        terminator.executor.set_pool_size(workers)
+        if tags:
+            out['Resources'] = terminator.tagging.discover(objects, tags, regions, workers, session)
+        else:
+            out['Resources'] = terminator.prepare_all(objects, workers)
+    except Exception as e:
+        out['Error'] = str(e)
+    if stats.enabled():
+        out['Stats'] = stats.snapshot()
+    return out
+
+def process_account(task):
+    "Worker process: assume the role and process the discovered resources, reports keyed by (region, service)"
+    role_arn, services, include, exclude, regions, workers, resources, dry_run, inventory, wait, engine, output = task
+    out = {'Role': role_arn, 'Account': account_id(role_arn), 'Report': {}, 'Error': '', 'Stats': None}
+    stats.reset()
+    try:
+        session = assume_role(role_arn)
+        objects = terminator.make_objects(services, include, exclude, regions, session, open_inventory(inventory))
+        for key, obj in objects.items():
+            obj.resources = resources.get(key, [])
+        terminator.executor.set_pool_size(workers)
+        groups = terminator.group_by_region(objects.values(), regions)
+        writer = None
+        if output:
+            from terminator import report
+            writer = report.open_writer(output, out['Account'])
+        if engine == "asyncio":
+            from terminator import aio
+            aio.process_all(groups, dry_run, output=writer)
+        else:
+            terminator.process_all(groups, dry_run, writer)
+        if wait and not dry_run:
+            terminator.waiter.wait_all(objects.values())
+        for key, obj in objects.items():
+            if obj.has_resources():
+                out['Report'][key] = list(obj.report)
+    except Exception as e:
+        out['Error'] = str(e)
+    if stats.enabled():
+        out['Stats'] = stats.snapshot()
+    return out
+
+def run_workers(func, tasks, processes):
+    "Run the function for every task in parallel worker processes, returns results in task order"
+    import multiprocessing
+    processes = max(1, min(processes, len(tasks)))
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(func, tasks, chunksize=1)
+
+def discover_accounts(roles, services, include, exclude, regions=[None], workers=1, tags=[], inventory=None):
+    "Discover resources of every account in parallel, one worker process per account"
+    tasks = [(role_arn, services, include, exclude, regions, workers, tags, inventory) for role_arn in roles]
+    return run_workers(discover_account, tasks, workers)
+
+def process_accounts(discovered, services, include, exclude, regions=[None], workers=1, dry_run=True, inventory=None, wait=False, engine="threads", output=None):
+    "Process resources discovered by discover_accounts() in parallel, one worker process per account"
+    tasks = [
+        (record['Role'], services, include, exclude, regions, workers, record['Resources'], dry_run, inventory, wait, engine, output)
+        for record in discovered if not record['Error']
+    ]
+    return run_workers(process_account, tasks, workers)
@@ -0,0 +1,141 @@
+import asyncio
+import contextlib
+from terminator import clients
+from terminator import ratelimit
+from terminator import scheduler
+from terminator import stats
+from terminator.errors import error_reason
+
+default_limit = 1000 # Default maximum number of removal requests in flight on the event loop
+
+def available():
+    "Returns True if the async AWS client library used by the engine is installed"
+    try:
+        import aiobotocore
+    except ImportError:
+        return False
+    return True
+
+class client_pool(object):
+    "Async AWS clients shared by all drivers on the event loop"
+
+    def __init__(self, stack, limit=default_limit):
+        "Constructor, clients are closed when the stack is closed"
+        from aiobotocore.config import AioConfig
+        from aiobotocore.session import get_session
+        self.stack = stack
+        self.session = get_session()
+        self.config = AioConfig(
+            max_pool_connections=limit,
+            # Throttled calls surface quickly and are rescheduled by the rate limiter
+            retries={'mode': 'standard', 'total_max_attempts': 3}
+        )
+        self.clients = {}
+        self.lock = asyncio.Lock()
+
+    async def get_client(self, service, region=None, session=None):
+        "Returns async client for the service, using credentials and region of the boto3 session"
+        session = clients.get_session(session)
+        region = region or session.region_name
+        key = (service, region, clients.credentials_key(session))
+        async with self.lock:
+            if key not in self.clients:
+                kwargs = {}
+                credentials = session.get_credentials()
+                if credentials is not None:
+                    credentials = credentials.get_frozen_credentials()
+                    kwargs['aws_access_key_id'] = credentials.access_key
+                    kwargs['aws_secret_access_key'] = credentials.secret_key
+                    kwargs['aws_session_token'] = credentials.token
+                self.clients[key] = clients.register_hooks(await self.stack.enter_async_context(
+                    self.session.create_client(service, region_name=region, config=self.config, **kwargs)
+                ), key[2])
+            return self.clients[key]
+
+async def call(client, operation, **kwargs):
+    "Await the client operation at the rate allowed for it, throttled calls are queued again instead of failing"
+    limiter = ratelimit.client_bucket(client, operation, kwargs)
+    requeues = 0
+    while True:
+        wait = limiter.try_acquire()
+        if wait:
+            await asyncio.sleep(wait)
+            continue
+        generation = limiter.generation
+        try:
+            response = await getattr(client, operation)(**kwargs)
+        except Exception as e:
+            if not ratelimit.is_throttling(e) or requeues >= ratelimit.max_requeues:
+                raise
+            limiter.throttled(generation)
+            requeues += 1
+            continue
+        limiter.success()
+        return response
+
+def is_native(obj):
+    "Returns True if resources of the object are removed by a single call each, described by the driver's delete_call()"
+    return hasattr(obj.drv, 'delete_call')
+
+async def remove_resource(drv, client, res, dry_run, semaphore):
+    "Remove the resource with the call described by the driver, returns the same report entry as the driver"
+    out = res.entry()
+    if dry_run:
+        out.result = "dryrun_success"
+        return out
+
+    operation, kwargs = drv.delete_call(res)
+    async with semaphore:
+        try:
+            await call(client, operation, **kwargs)
+        except Exception as e:
+            out.result = "error"
+            out.reason = error_reason(e)
+        else:
+            out.result = "success"
+    return out
+
+async def process(obj, dry_run, pool, semaphore, limit=default_limit, output=None):
+    "Process resources of the terminator object, drivers removing resources in several steps run in a worker thread"
+    if not is_native(obj):
+        return await asyncio.to_thread(obj.process, dry_run, output)
+
+    client = await pool.get_client(getattr(obj.drv, 'service', obj.driver), obj.region, obj.session)
+    journal = obj.journal if not dry_run else None
+    report = None
+    if output is None:
+        report = [None] * len(obj.resources)
+    resources = enumerate(obj.resources)
+
+    async def worker():
+        # Workers take resources one by one, so only limit removals are pending at any time
+        for i, res in resources:
+            entry = await remove_resource(obj.drv, client, res, dry_run, semaphore)
+            if journal is not None:
+                journal.done(obj, entry)
+            if output is None:
+                report[i] = entry
+            else:
+                obj.write_results([entry], dry_run, output)
+
+    with stats.timer(obj.driver, 'process'):
+        await asyncio.gather(*[worker() for i in range(min(limit, len(obj.resources)))])
+    if output is not None:
+        return obj.report
+    return obj.set_report(report, dry_run)
+
+async def _process_all(objects, dry_run, limit, output):
+    async with contextlib.AsyncExitStack() as stack:
+        pool = client_pool(stack, limit)
+        semaphore = asyncio.Semaphore(limit)
+        await scheduler.run_async(objects, lambda obj: process(obj, dry_run, pool, semaphore, limit, output))
+    return objects
+
+def process_all(groups, dry_run=True, limit=default_limit, output=None):
+    "Process terminator objects of all regions on a single event loop, keeping at most limit removals in flight"
+    objects = []
+    for group in groups.values():
+        objects.extend(obj for obj in group if obj.has_resources())
+
+    asyncio.run(_process_all(objects, dry_run, limit, output))
+    return groups
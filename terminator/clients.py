@@ -0,0 +1,84 @@
+import os
+import threading
+import weakref
+
+default_pool_connections = 10 # botocore default size of HTTP connection pool
+
+_clients = {}
+_credentials = weakref.WeakKeyDictionary() # Credentials keys of the clients created here, for clients of both engines
+_hooks = []
+_lock = threading.Lock()
+_pool_connections = default_pool_connections
+
+def set_pool_size(workers):
+    "Size HTTP connection pools of clients created afterwards to the number of workers"
+    global _pool_connections
+    # Drivers may keep a few requests in flight for every resource removed in parallel
+    _pool_connections = max(default_pool_connections, workers * 2)
+    return _pool_connections
+
+def add_hook(event, handler):
+    "Register botocore event handler on every client, including clients created already"
+    with _lock:
+        _hooks.append((event, handler))
+        for client in _clients.values():
+            client.meta.events.register(event, handler)
+    return True
+
+def register_hooks(client, credentials=None):
+    "Register event handlers added with add_hook() on the client, and remember the key of the credentials it was created with"
+    for event, handler in list(_hooks):
+        client.meta.events.register(event, handler)
+    if credentials is not None:
+        _credentials[client] = credentials
+    return client
+
+def client_credentials_key(client):
+    "Returns the key identifying credentials the client was created with, None if it was not created here"
+    return _credentials.get(client)
+
+def get_session(session=None):
+    "Returns the session if one is given, or the default boto3 session created on first use"
+    import boto3
+    if session is None:
+        if boto3.DEFAULT_SESSION is None:
+            boto3.setup_default_session()
+        session = boto3.DEFAULT_SESSION
+    return session
+
+def credentials_key(session):
+    "Returns the key identifying credentials of the session"
+    credentials = session.get_credentials()
+    if credentials is None:
+        return None
+    return credentials.get_frozen_credentials().access_key
+
+def get_client(service, region=None, session=None):
+    "Returns boto3 client for the service shared by all drivers, created from the session if one is given"
+    from botocore.config import Config
+
+    # Clients are thread safe, but their creation is not
+    with _lock:
+        session = get_session(session)
+        key = (service, region or session.region_name, credentials_key(session))
+        if key not in _clients:
+            _clients[key] = session.client(
+                service,
+                region_name=region,
+                config=Config(
+                    max_pool_connections=_pool_connections,
+                    # Throttled calls surface quickly and are rescheduled by terminator.ratelimit
+                    retries={'mode': 'standard', 'total_max_attempts': 3}
+                )
+            )
+            register_hooks(_clients[key], key[2])
+        return _clients[key]
+
+def clear():
+    "Forget all cached clients"
+    global _lock
+    _clients.clear()
+    _lock = threading.Lock()
+
+# Connection pools must not be shared with forked worker processes
+os.register_at_fork(after_in_child=clear)
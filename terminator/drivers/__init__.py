@@ -1,2 +1,18 @@
 # This sub-package contains drivers for AWS Terminator
 
+# Static manifest of the available drivers, used to list them without importing the driver modules.
+# Drivers read their _description and priority from it.
+manifest = {
+    'apigateway':    {'description': "API gateways",              'priority': 1},
+    'codebuild':     {'description': "CodeBuild Projects",        'priority': 1},
+    'dynamodb':      {'description': "DynamoDB tables",           'priority': 8},
+    'ec2':           {'description': "EC2 instances",             'priority': 1},
+    'glue_conn':     {'description': "Glue database connections", 'priority': 2},
+    'glue_crawlers': {'description': "Glue crawlers",             'priority': 3},
+    'glue_db':       {'description': "Glue databases",            'priority': 4},
+    'glue_jobs':     {'description': "Glue Jobs",                 'priority': 1},
+    'iam':           {'description': "IAM Roles and Policies",    'priority': 100},
+    'lambda':        {'description': "Lambda Functions",          'priority': 2},
+    's3':            {'description': "S3 Buckets",                'priority': 10},
+    'sfn':           {'description': "Step functions",            'priority': 1},
+}
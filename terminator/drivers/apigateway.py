@@ -1,89 +1,109 @@
-import boto3
 import sys
+from terminator import clients
+from terminator import executor
+from terminator import pagination
+from terminator import ratelimit
+from terminator import records
+from terminator.drivers import manifest
+from terminator.errors import error_reason
 
-__all__ = ['priority', 'help_string', 'prepare', 'process', 'print_prepare_message', 'print_report']
+__all__ = ['priority', 'prepare', 'process', 'print_prepare_message', 'print_report']
 
-priority = 1 # The driver execution priority (drivers are processed from lowest to highest value).
+depends = [] # Drivers whose resources are processed before the resources of this driver
+concurrency = 1 # The maximum number of resources removed simultaneously
+arn_types = ['apigateway:restapis'] # Resource types of the driver in the Resource Groups Tagging API
+service = 'apigateway' # The AWS service of the driver's resources
 
 _name = "apigateway"
-_description = "API gateways"
+_description = manifest[_name]['description']
 
-def help_string():
-    whitespace_len = 25-len(_name)
-    return "  --%s%s%s" % (_name, ' '*whitespace_len, _description)
+priority = manifest[_name]['priority'] # The driver priority, drivers are listed from lowest to highest value
 
-def prepare(include, exclude):
-    client = boto3.client(_name);
-    out = list_resources(client, include, exclude)
+def prepare(match, region=None, session=None):
+    client = clients.get_client(_name, region, session)
+    out = list_resources(client, match)
     return out
 
-def process(resources_list, dry_run=True):
-    out = []
-    client = boto3.client(_name)
-    for resource in resources_list:
-        out.append(remove_resource(client, resource, dry_run))
-    return out
+def inventory(region=None, session=None):
+    "Returns the list of all resources, regardless of include and exclude patterns"
+    client = clients.get_client(_name, region, session)
+    return list(iterate_resources(client))
+
+def process(resources_list, dry_run=True, workers=1, region=None, session=None):
+    client = clients.get_client(_name, region, session)
+    return executor.bounded_imap(
+        lambda resource: remove_resource(client, resource, dry_run),
+        resources_list,
+        workers
+    )
 
 def print_prepare_message(resources_list):
     if resources_list:
         print("%s:" % (_description))
         for obj in resources_list:
-            print("  %s (%s)" % (obj['Name'], obj['Id']))
+            print("  %s (%s)" % (obj.name, obj.id))
     return True
 
 def print_report(report):
     if report:
         print("%s:" % (_description))
         for obj in report:
-            if (obj['Reason']):
-                result_string = "%s (%s)" % (obj['Result'], obj['Reason'])
+            if (obj.reason):
+                result_string = "%s (%s)" % (obj.result, obj.reason)
             else:
-                result_string = obj['Result']
-            print("  %s (%s) - %s" % (obj['Name'], obj['Id'], result_string))
+                result_string = obj.result
+            print("  %s (%s) - %s" % (obj.name, obj.id, result_string))
     return True
 
-# TODO: implement continuation token usage (to process more than 500 objects)
-def list_resources(client, include, exclude):
+def list_resources(client, match):
     "This function returns list of resources matching include and exclude patterns"
     out = []
 
-    if len(include) == 0 and len(exclude) == 0:
+    if not match:
         return out
 
-    response = client.get_rest_apis(
-        limit=500
-    )
-
-    for res in response['items']:
-        if len(include) > 0 and len(exclude) > 0:
-            if res['name'].find(include) != -1 and res['name'].find(exclude) == -1:
-                out.append({'Name': res['name'], 'Id': res['id']})
-        elif len(include) > 0 and res['name'].find(include) != -1:
-            out.append({'Name': res['name'], 'Id': res['id']})
-        elif len(exclude) > 0 and res['name'].find(exclude) == -1:
-            out.append({'Name': res['name'], 'Id': res['id']})
+    for res in iterate_resources(client):
+        if match(res.name):
+            out.append(res)
     return out
 
+def iterate_resources(client):
+    "This function yields all resources"
+    for res in pagination.paginate(client, 'get_rest_apis', 'items', page_size=500):
+        yield records.record(res['name'], id=res['id'], type=_name)
+
+def existing(report, region=None, session=None):
+    "This function returns report entries of APIs which still exist, checked with a single listing"
+    client = clients.get_client(_name, region, session)
+    apis = set(res.id for res in iterate_resources(client))
+    return [entry for entry in report if entry.id in apis]
+
+def resource_from_arn(resource_id, arn, tags):
+    "This function returns the resource described by the tagged ARN"
+    # Stages and other child resources are removed with the API itself
+    if '/' in resource_id:
+        return None
+    return records.record(tags.get('Name', resource_id), id=resource_id, type=_name)
+
+def delete_call(res):
+    "This function returns the operation and its arguments removing API gateway"
+    return 'delete_rest_api', {'restApiId': res.id}
+
 def remove_resource(client, res, dry_run=True):
     "This function removes Glue db or emulates removal if global dry_run_flag is set to True"
-    out = {}
-    out['Name'] = res['Name']
-    out['Id'] = res['Id']
-    out['Type'] = _name
-    out['Reason'] = ''
+    out = res.entry()
     
     if dry_run:
-        out['Result'] = "dryrun_success"
+        out.result = "dryrun_success"
     else:
         try:
-            client.delete_rest_api(
-                restApiId = res['Id']
-            )
+            operation, kwargs = delete_call(res)
+            ratelimit.call(client, operation, **kwargs)
         except Exception as e:
-            out['Result'] = "error"
-            out['Reason'] = e.__class__
+            out.result = "error"
+            out.reason = error_reason(e)
         else: 
-            out['Result'] = "success"
+            out.result = "success"
 
     return(out)
 
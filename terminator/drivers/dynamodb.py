@@ -1,100 +1,108 @@
-import boto3
 import sys
+from terminator import clients
+from terminator import executor
+from terminator import pagination
+from terminator import ratelimit
+from terminator import records
+from terminator.drivers import manifest
+from terminator.errors import error_reason
 
-__all__ = ['help_string', 'prepare', 'process', 'print_prepare_message', 'print_report']
+__all__ = ['prepare', 'process', 'print_prepare_message', 'print_report']
 
-priority = 8 # The driver execution priority (drivers are processed from lowest to highest value)
+depends = ['lambda'] # Drivers whose resources are processed before the resources of this driver
+concurrency = 10 # The maximum number of resources removed simultaneously
+arn_types = ['dynamodb:table'] # Resource types of the driver in the Resource Groups Tagging API
+service = 'dynamodb' # The AWS service of the driver's resources
 
 _name = "dynamodb"
-_description = "DynamoDB tables"
+_description = manifest[_name]['description']
 
-def help_string():
-    whitespace_len = 25-len(_name)
-    return "  --%s%s%s" % (_name, ' '*whitespace_len, _description)
+priority = manifest[_name]['priority'] # The driver priority, drivers are listed from lowest to highest value
 
-def prepare(include, exclude):
-    client = boto3.client(_name);
-    out = list_resources(client, include, exclude)
+def prepare(match, region=None, session=None):
+    client = clients.get_client(_name, region, session)
+    out = list_resources(client, match)
     return out
 
-def process(resources_list, dry_run=True):
-    out = []
-    client = boto3.client(_name)
-    for resource in resources_list:
-        out.append(remove_resource(client, resource, dry_run))
-    return out
+def inventory(region=None, session=None):
+    "Returns the list of all resources, regardless of include and exclude patterns"
+    client = clients.get_client(_name, region, session)
+    return list(iterate_resources(client))
+
+def process(resources_list, dry_run=True, workers=1, region=None, session=None):
+    client = clients.get_client(_name, region, session)
+    return executor.bounded_imap(
+        lambda resource: remove_resource(client, resource, dry_run),
+        resources_list,
+        workers
+    )
 
 def print_prepare_message(resources_list):
     if resources_list:
         print("%s:" % (_description))
         for obj in resources_list:
-            print("  %s" % (obj))
+            print("  %s" % (obj.name))
     return True
 
 def print_report(report):
     if report:
         print("%s:" % (_description))
         for obj in report:
-            if (obj['Reason']):
-                result_string = "%s (%s)" % (obj['Result'], obj['Reason'])
+            if (obj.reason):
+                result_string = "%s (%s)" % (obj.result, obj.reason)
             else:
-                result_string = obj['Result']
-            print("  %s - %s" % (obj['Name'], result_string))
+                result_string = obj.result
+            print("  %s - %s" % (obj.name, result_string))
     return True
 
-def list_resources(client, include, exclude):
+def list_resources(client, match):
     "This function returns list of resources matching include and exclude patterns"
     out = []
 
-    if len(include) == 0 and len(exclude) == 0:
-        return out
-    
-    finished = False
-    last_table = '' 
-    while not finished:
-        if not last_table:
-            response = client.list_tables(
-                Limit = 100
-            )
-        else:
-            response = client.list_tables(
-                Limit = 100,
-                ExclusiveStartTableName = last_table
-            )
-        if 'LastEvaluatedTableName' not in response.keys():
-            finished = True
-        else:
-            last_table = response['LastEvaluatedTableName']
-
-        for res in response['TableNames']:
-            if len(include) > 0 and len(exclude) > 0:
-                if res.find(include) != -1 and res.find(exclude) == -1:
-                    out.append(res)
-            elif len(include) > 0 and res.find(include) != -1:
-                out.append(res)
-            elif len(exclude) > 0 and res.find(exclude) == -1:
-                out.append(res)
+    if not match:
         return out
 
+    for res in iterate_resources(client):
+        if match(res.name):
+            out.append(res)
+    return out
+
+def iterate_resources(client):
+    "This function yields all resources"
+    for res in pagination.paginate(client, 'list_tables', 'TableNames', page_size=100):
+        yield records.record(res, type=_name)
+
+def existing(report, region=None, session=None):
+    "This function returns report entries of tables which still exist, checked with a single listing"
+    client = clients.get_client(_name, region, session)
+    tables = set(res.name for res in iterate_resources(client))
+    return [entry for entry in report if entry.name in tables]
+
+def resource_from_arn(resource_id, arn, tags):
+    "This function returns the resource described by the tagged ARN"
+    if '/' in resource_id:
+        return None
+    return records.record(resource_id, type=_name)
+
+def delete_call(res):
+    "This function returns the operation and its arguments removing DynamoDB table"
+    return 'delete_table', {'TableName': res.name}
+
 def remove_resource(client, res, dry_run=True):
     "This function removes resource or emulates removal if global dry_run_flag is set to True"
-    out = {}
-    out['Name'] = res
-    out['Type'] = _name
-    out['Reason'] = ''
+    out = res.entry()
     
     if dry_run:
-        out['Result'] = "dryrun_success"
+        out.result = "dryrun_success"
     else:
         try:
-            client.delete_table(
-                TableName=res
-            )
+            operation, kwargs = delete_call(res)
+            ratelimit.call(client, operation, **kwargs)
         except Exception as e:
-            out['Result'] = "error"
-            out['Reason'] = e.__class__
+            out.result = "error"
+            out.reason = error_reason(e)
         else: 
-            out['Result'] = "success"
+            out.result = "success"
 
     return(out)
 
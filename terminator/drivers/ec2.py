@@ -1,118 +1,187 @@
-import boto3
 import sys
+from terminator import clients
+from terminator import executor
+from terminator import pagination
+from terminator import ratelimit
+from terminator import records
+from terminator.drivers import manifest
+from terminator.errors import error_code, error_reason
 
-__all__ = ['help_string', 'prepare', 'process', 'print_prepare_message', 'print_report']
+__all__ = ['prepare', 'process', 'print_prepare_message', 'print_report']
 
-priority = 1 # The driver execution priority (drivers are processed from lowest to highest value)
+depends = [] # Drivers whose resources are processed before the resources of this driver
+concurrency = 4 # The maximum number of resources removed simultaneously
+arn_types = ['ec2:instance'] # Resource types of the driver in the Resource Groups Tagging API
+
+_batch_size = 1000 # The maximum number of instances terminated with a single API call
+_filter_size = 200 # The maximum number of instance IDs checked with a single filter
 
 _name = "ec2"
-_description = "EC2 instances"
+_description = manifest[_name]['description']
 
-def help_string():
-    whitespace_len = 25-len(_name)
-    return "  --%s%s%s" % (_name, ' '*whitespace_len, _description)
+priority = manifest[_name]['priority'] # The driver priority, drivers are listed from lowest to highest value
 
-def prepare(include, exclude):
+def prepare(match, region=None, session=None):
     out = []
-    client = boto3.client(_name);
-    out = list_instances(client, include, exclude)
+    client = clients.get_client(_name, region, session)
+    out = list_instances(client, match)
     return out
 
-def process(instances_list, dry_run=True):
-    out = []
-    client = boto3.resource(_name)
-    for instance in instances_list:
-        out.append(remove_instance(client, instance, dry_run))
-    return out
+def inventory(region=None, session=None):
+    "Returns the list of all resources, regardless of include and exclude patterns"
+    client = clients.get_client(_name, region, session)
+    # Only instances with a Name tag, like the listing of prepare()
+    return list(iterate_resources(client, '*'))
+
+def process(instances_list, dry_run=True, workers=1, region=None, session=None):
+    client = clients.get_client(_name, region, session)
+    batches = (
+        instances_list[i:i + _batch_size]
+        for i in range(0, len(instances_list), _batch_size)
+    )
+    for report in executor.bounded_imap(
+        lambda batch: remove_instances(client, batch, dry_run),
+        batches,
+        workers
+    ):
+        for entry in report:
+            yield entry
 
 def print_prepare_message(instances_list):
     if instances_list:
         print("%s:" % (_description))
         for obj in instances_list:
-            print("  %s (%s)" % (obj['Name'], obj['Id']))
+            print("  %s (%s)" % (obj.name, obj.id))
     return True
 
 def print_report(report):
     if report:
         print("%s:" % (_description))
         for obj in report:
-            if (obj['Reason']):
-                result_string = "%s (%s)" % (obj['Result'], obj['Reason'])
+            if (obj.reason):
+                result_string = "%s (%s)" % (obj.result, obj.reason)
             else:
-                result_string = obj['Result']
-            print("  %s (%s) - %s" % (obj['Name'], obj['Id'], result_string))
+                result_string = obj.result
+            print("  %s (%s) - %s" % (obj.name, obj.id, result_string))
     return True
 
 def get_name_tag(instance):
     out = ''
-    for tag in instance['Tags']:
+    for tag in instance.get('Tags', []):
         if tag['Key'] == 'Name':
             out = tag['Value']
             break
     return out
 
-def list_instances(client, include, exclude):
+def list_instances(client, match):
     "This function returns list of EC2 instances matching include and exclude patterns"
     out = []
-    if len(include) == 0 and len(exclude) == 0:
+    if not match:
         return out
-    elif len(include) == 0:
-        include = '*'
+
+    # A single substring include is filtered by EC2, other patterns only by the matcher
+    include = match.literal_include()
+    if include is None:
+        name_filter = '*'
     else:
-        include = '*' + include + '*'
+        name_filter = '*' + include + '*'
+
+    for instance in iterate_resources(client, name_filter):
+        if match(instance.name):
+            out.append(instance)
+    return out
 
-    response = client.describe_instances(
-        Filters=[
+def iterate_resources(client, name_filter=None):
+    "This function yields all resources, or only resources with Name tag matching the filter"
+    kwargs = {}
+    if name_filter is not None:
+        kwargs['Filters'] = [
             {
                 'Name': 'tag:Name',
                 'Values': [
-                    include,
+                    name_filter,
                 ]
             }
         ]
-    )
-
-    for reservation in response['Reservations']:
-        name_tag = ''
+    reservations = pagination.paginate(client, 'describe_instances', 'Reservations', page_size=1000, **kwargs)
+    for reservation in reservations:
         for instance in reservation['Instances']:
-            name_tag = get_name_tag(instance)
-            if len(exclude) > 0 and name_tag.find(exclude) != -1:
-                continue
             if instance['State']['Name'] != 'terminated':
-                out.append(
-                    {
-                        'Name': name_tag,
-                        'Id': instance['InstanceId']
-                    }
-                )
-                        
-    return(out)
+                yield records.record(get_name_tag(instance), id=instance['InstanceId'], type=_name)
+
+def existing(report, region=None, session=None):
+    "This function returns report entries of instances not terminated yet, checked with one call per batch of IDs"
+    client = clients.get_client(_name, region, session)
+    instances = set()
+    for i in range(0, len(report), _filter_size):
+        reservations = pagination.paginate(
+            client,
+            'describe_instances',
+            'Reservations',
+            page_size=1000,
+            Filters=[
+                {
+                    'Name': 'instance-id',
+                    'Values': [entry.id for entry in report[i:i+_filter_size]]
+                }
+            ]
+        )
+        for reservation in reservations:
+            for instance in reservation['Instances']:
+                if instance['State']['Name'] != 'terminated':
+                    instances.add(instance['InstanceId'])
+    return [entry for entry in report if entry.id in instances]
 
-def remove_instance(client, instance, dry_run=True):
-    "This function removes EC2 instance or emulates removal if global dry_run_flag is set to True"
-    out = {}
-    out['Id'] = instance['Id']
-    out['Name'] = instance['Name']
-    out['Type'] = _name
-    out['Reason'] = ''
-    
+def resource_from_arn(resource_id, arn, tags):
+    "This function returns the instance described by the tagged ARN"
+    return records.record(tags.get('Name', ''), id=resource_id, type=_name)
 
-    instance = client.Instance(instance['Id'])
+def remove_instances(client, instances, dry_run=True):
+    "This function terminates a batch of EC2 instances with a single call or emulates removal if dry_run is set to True"
+    if len(instances) == 1:
+        return [remove_instance(client, instances[0], dry_run)]
 
     try:
-        instance.terminate(
+        response = ratelimit.call(
+            client,
+            'terminate_instances',
+            InstanceIds = [instance.id for instance in instances],
             DryRun = dry_run
         )
     except Exception as e:
-        if e.response['Error']['Code'] == 'DryRunOperation':
-            out['Result'] = "dryrun_success"
+        if error_code(e) == 'DryRunOperation':
+            return [instance.entry("dryrun_success") for instance in instances]
+        # One bad instance fails the whole batch, so find out which one
+        return [remove_instance(client, instance, dry_run) for instance in instances]
+
+    terminating = set()
+    for state in response['TerminatingInstances']:
+        terminating.add(state['InstanceId'])
+
+    out = []
+    for instance in instances:
+        if instance.id in terminating:
+            out.append(instance.entry("success"))
         else:
-            out['Result'] = "error"
-            out['Reason'] = e.__class__
-    else: 
-        out['Result'] = "success"
+            out.append(remove_instance(client, instance, dry_run))
+    return out
 
-    return(out)
+def remove_instance(client, instance, dry_run=True):
+    "This function removes EC2 instance or emulates removal if global dry_run_flag is set to True"
+    try:
+        ratelimit.call(
+            client,
+            'terminate_instances',
+            InstanceIds = [instance.id],
+            DryRun = dry_run
+        )
+    except Exception as e:
+        if error_code(e) == 'DryRunOperation':
+            return instance.entry("dryrun_success")
+        else:
+            return instance.entry("error", error_reason(e))
+    else: 
+        return instance.entry("success")
 
 if __name__ == "__main__":
     sys.exit()
@@ -1,89 +1,101 @@
-import boto3
 import sys
+from terminator import clients
+from terminator import executor
+from terminator import pagination
+from terminator import ratelimit
+from terminator import records
+from terminator.drivers import manifest
+from terminator.errors import error_reason
 
-__all__ = ['help_string', 'prepare', 'process', 'print_prepare_message', 'print_report']
+__all__ = ['prepare', 'process', 'print_prepare_message', 'print_report']
 
-priority = 1 # The driver execution priority (drivers are processed from lowest to highest value)
+depends = [] # Drivers whose resources are processed before the resources of this driver
+concurrency = 10 # The maximum number of resources removed simultaneously
+arn_types = ['glue:job'] # Resource types of the driver in the Resource Groups Tagging API
+service = 'glue' # The AWS service of the driver's resources
 
 _name = "glue_jobs"
-_description = "Glue Jobs"
+_description = manifest[_name]['description']
 
-def help_string():
-    whitespace_len = 25-len(_name)
-    return "  --%s%s%s" % (_name, ' '*whitespace_len, _description)
+priority = manifest[_name]['priority'] # The driver priority, drivers are listed from lowest to highest value
 
-def prepare(include, exclude):
-    client = boto3.client('glue');
-    out = list_jobs(client, include, exclude)
+def prepare(match, region=None, session=None):
+    client = clients.get_client('glue', region, session)
+    out = list_jobs(client, match)
     return out
 
-def process(jobs_list, dry_run=True):
-    out = []
-    client = boto3.client('glue')
-    for job in jobs_list:
-        out.append(remove_job(client, job, dry_run))
-    return out
+def inventory(region=None, session=None):
+    "Returns the list of all resources, regardless of include and exclude patterns"
+    client = clients.get_client('glue', region, session)
+    return list(iterate_resources(client))
+
+def process(jobs_list, dry_run=True, workers=1, region=None, session=None):
+    client = clients.get_client('glue', region, session)
+    return executor.bounded_imap(
+        lambda job: remove_job(client, job, dry_run),
+        jobs_list,
+        workers
+    )
 
 def print_prepare_message(resources_list):
     if resources_list:
         print("%s:" % (_description))
         for obj in resources_list:
-            print("  %s" % (obj))
+            print("  %s" % (obj.name))
     return True
 
 def print_report(report):
     if report:
         print("%s:" % (_description))
         for obj in report:
-            if (obj['Reason']):
-                result_string = "%s (%s)" % (obj['Result'], obj['Reason'])
+            if (obj.reason):
+                result_string = "%s (%s)" % (obj.result, obj.reason)
             else:
-                result_string = obj['Result']
-            print("  %s - %s" % (obj['Name'], result_string))
+                result_string = obj.result
+            print("  %s - %s" % (obj.name, result_string))
     return True
 
 
-# TODO: implement continuation token usage (to process more than 1000 objects)
-def list_jobs(client, include, exclude):
+def list_jobs(client, match):
     "This function returns list of Glue jobs matching include and exclude patterns"
     out = []
 
-    if len(include) == 0 and len(exclude) == 0:
+    if not match:
         return out
 
-    response = client.get_jobs(
-        MaxResults=1000
-    )
-
-    for job in response['Jobs']:
-        if len(include) > 0 and len(exclude) > 0:
-            if job['Name'].find(include) != -1 and job['Name'].find(exclude) == -1:
-                out.append(job['Name'])
-        elif len(include) > 0 and job['Name'].find(include) != -1:
-            out.append(job['Name'])
-        elif len(exclude) > 0 and job['Name'].find(exclude) == -1:
-            out.append(job['Name'])
+    for res in iterate_resources(client):
+        if match(res.name):
+            out.append(res)
     return out
 
+def iterate_resources(client):
+    "This function yields all resources"
+    for job in pagination.paginate(client, 'get_jobs', 'Jobs', page_size=1000):
+        yield records.record(job['Name'], type=_name)
+
+def resource_from_arn(resource_id, arn, tags):
+    "This function returns the job described by the tagged ARN"
+    return records.record(resource_id, type=_name)
+
+def delete_call(job):
+    "This function returns the operation and its arguments removing Glue job"
+    return 'delete_job', {'JobName': job.name}
+
 def remove_job(client, job, dry_run=True):
     "This function removes Glue job or emulates removal if global dry_run_flag is set to True"
-    out = {}
-    out['Name'] = job
-    out['Type'] = _name
-    out['Reason'] = ''
+    out = job.entry()
     
     if dry_run:
-        out['Result'] = "dryrun_success"
+        out.result = "dryrun_success"
     else:
         try:
-            client.delete_job(
-                JobName=job
-            )
+            operation, kwargs = delete_call(job)
+            ratelimit.call(client, operation, **kwargs)
         except Exception as e:
-            out['Result'] = "error"
-            out['Reason'] = e.__class__
+            out.result = "error"
+            out.reason = error_reason(e)
         else: 
-            out['Result'] = "success"
+            out.result = "success"
 
     return(out)
 
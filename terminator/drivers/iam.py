@@ -1,36 +1,51 @@
-import boto3
 import sys
+from terminator import clients
+from terminator import executor
+from terminator import pagination
+from terminator import ratelimit
+from terminator import records
+from terminator.drivers import manifest
+from terminator.errors import error_code, error_reason
 
-__all__ = ['help_string', 'prepare', 'process', 'print_prepare_message', 'print_report']
+__all__ = ['prepare', 'process', 'print_prepare_message', 'print_report']
 
-priority = 100 # The driver execution priority (drivers are processed from lowest to highest value)
+depends = ['codebuild', 'ec2', 'glue_crawlers', 'glue_jobs', 'lambda', 'sfn'] # Drivers whose resources are processed before the resources of this driver
+concurrency = 16 # The maximum number of resources removed simultaneously, IAM calls are paced by the rate limiter
+arn_types = ['iam:role', 'iam:policy'] # Resource types of the driver in the Resource Groups Tagging API
+regional = False # Resources are global and processed once for all regions
 
 _name = "iam"
-_description = "IAM Roles and Policies"
+_description = manifest[_name]['description']
 
-def help_string():
-    whitespace_len = 25-len(_name)
-    return "  --%s%s%s" % (_name, ' '*whitespace_len, _description)
+priority = manifest[_name]['priority'] # The driver priority, drivers are listed from lowest to highest value
 
-def prepare(include, exclude):
-    client = boto3.client(_name);
-    out = list_resources(client, include, exclude)
+def prepare(match, region=None, session=None):
+    client = clients.get_client(_name, region, session)
+    out = list_resources(client, match)
     if not out['Roles'] and not out['Policies']:
         out = []
     return out
 
-def process(resources_list, dry_run=True):
-    out = {}
-    out['Roles'] = []
-    out['Policies'] = []
+def inventory(region=None, session=None):
+    "Returns the list of all resources, regardless of include and exclude patterns"
+    client = clients.get_client(_name, region, session)
+    return list(iterate_resources(client))
 
-    client = boto3.client(_name)
-    for resource in resources_list['Roles']:
-        out['Roles'].append(remove_resource(client, 'iam_role', resource, dry_run))
-    for resource in resources_list['Policies']:
-        out['Policies'].append(remove_resource(client, 'iam_policy', resource, dry_run))
-
-    return out
+def process(resources_list, dry_run=True, workers=1, region=None, session=None):
+    client = clients.get_client(_name, region, session)
+    # Roles are removed first, so policies are detached before their removal
+    for entry in executor.bounded_imap(
+        lambda resource: remove_resource(client, 'iam_role', resource, dry_run),
+        resources_list['Roles'],
+        workers
+    ):
+        yield entry
+    for entry in executor.bounded_imap(
+        lambda resource: remove_resource(client, 'iam_policy', resource, dry_run),
+        resources_list['Policies'],
+        workers
+    ):
+        yield entry
 
 def print_prepare_message(resources_list):
     if not resources_list:
@@ -38,137 +53,237 @@ def print_prepare_message(resources_list):
     if resources_list['Roles']:
         print("IAM Roles:")
         for obj in resources_list['Roles']:
-            print("  %s (%s)" % (obj['Name'], obj['Arn']))
+            print("  %s (%s)" % (obj.name, obj.arn))
     if resources_list['Policies']:
         print("IAM Policies:")
         for obj in resources_list['Policies']:
-            print("  %s (%s)" % (obj['Name'], obj['Arn']))
+            print("  %s (%s)" % (obj.name, obj.arn))
     return True
 
 def print_report(report):
-    if not report:
-        return True
-    if report['Roles']:
+    roles = [obj for obj in report if obj.type == 'iam_role']
+    policies = [obj for obj in report if obj.type == 'iam_policy']
+    if roles:
         print("IAM Roles:")
-        for obj in report['Roles']:
-            if (obj['Reason']):
-                result_string = "%s (%s)" % (obj['Result'], obj['Reason'])
+        for obj in roles:
+            if (obj.reason):
+                result_string = "%s (%s)" % (obj.result, obj.reason)
             else:
-                result_string = obj['Result']
-            print("  %s (%s) - %s" % (obj['Name'], obj['Arn'], result_string))
-    if report['Policies']:
+                result_string = obj.result
+            print("  %s (%s) - %s" % (obj.name, obj.arn, result_string))
+    if policies:
         print("IAM Policies:")
-        for obj in report['Policies']:
-            if (obj['Reason']):
-                result_string = "%s (%s)" % (obj['Result'], obj['Reason'])
+        for obj in policies:
+            if (obj.reason):
+                result_string = "%s (%s)" % (obj.result, obj.reason)
             else:
-                result_string = obj['Result']
-            print("  %s (%s) - %s" % (obj['Name'], obj['Arn'], result_string))
+                result_string = obj.result
+            print("  %s (%s) - %s" % (obj.name, obj.arn, result_string))
     return True
 
-# TODO: implement continuation token usage (to process more than 1000 objects)
-def list_resources(client, include, exclude):
+def list_resources(client, match):
     "This function returns list of resources matching include and exclude patterns"
     out = {}
     out['Roles'] = []
     out['Policies'] = []
 
-    if len(include) == 0 and len(exclude) == 0:
+    if not match:
         return out
-    
-    finished = False
-    next_token = ''
-    while not finished:
-        if not next_token:
-            response = client.list_roles(
-                MaxItems=1000
-            )
-        else:
-            response = client.list_roles(
-                MaxItems=1000,
-                Marker=next_token
-            )
 
-        if not response['IsTruncated']:
-            finished = True
+    for res in iterate_resources(client):
+        if not match(res.name):
+            continue
+        if res.type == 'iam_role':
+            out['Roles'].append(res)
         else:
-            next_token = response['Marker']
-
-        for res in response['Roles']:
-            if len(include) > 0 and len(exclude) > 0:
-                if res['RoleName'].find(include) != -1 and res['RoleName'].find(exclude) == -1:
-                    out['Roles'].append({'Name': res['RoleName'], 'Arn': res['Arn']})
-            elif len(include) > 0 and res['RoleName'].find(include) != -1:
-                out['Roles'].append({'Name': res['RoleName'], 'Arn': res['Arn']})
-            elif len(exclude) > 0 and res['RoleName'].find(exclude) == -1:
-                out['Roles'].append({'Name': res['RoleName'], 'Arn': res['Arn']})
-
-    finished = False
-    next_token = ''
-    while not finished:
-        if not next_token:
-            response = client.list_policies(
-                Scope='Local',
-                MaxItems=1000
+            out['Policies'].append(res)
+    return out
+
+def iterate_resources(client):
+    "This function yields all resources, with their attachments if authorization details can be read"
+    listed = False
+    try:
+        for res in iterate_authorization_details(client):
+            listed = True
+            yield res
+    except Exception as e:
+        # Authorization details are refused on the first page, later errors are not retried with other listings
+        if listed or error_code(e) != 'AccessDenied':
+            raise
+    else:
+        return
+
+    for res in pagination.paginate(client, 'list_roles', 'Roles', page_size=1000):
+        yield records.record(res['RoleName'], arn=res['Arn'], type='iam_role')
+    for res in pagination.paginate(client, 'list_policies', 'Policies', page_size=1000, Scope='Local'):
+        yield records.record(res['PolicyName'], arn=res['Arn'], type='iam_policy')
+
+def iterate_authorization_details(client):
+    "This function yields roles with their attachments and local policies with their versions of a single listing, page by page"
+    pages = pagination.paginate_pages(
+        client,
+        'get_account_authorization_details',
+        page_size=1000,
+        Filter=['Role', 'LocalManagedPolicy']
+    )
+    for page in pages:
+        for role in page.get('RoleDetailList', []):
+            yield records.record(
+                role['RoleName'],
+                arn=role['Arn'],
+                type='iam_role',
+                data={'Attachments': {
+                    'AttachedPolicies': [att['PolicyArn'] for att in role.get('AttachedManagedPolicies', [])],
+                    'RolePolicies': [policy['PolicyName'] for policy in role.get('RolePolicyList', [])],
+                    'InstanceProfiles': [profile['InstanceProfileName'] for profile in role.get('InstanceProfileList', [])],
+                }}
             )
-        else:
-            response = client.list_policies(
-                Scope='Local',
-                MaxItems=1000,
-                Marker=next_token
+        for policy in page.get('Policies', []):
+            yield records.record(
+                policy['PolicyName'],
+                arn=policy['Arn'],
+                type='iam_policy',
+                data={'Versions': [
+                    version['VersionId'] for version in policy.get('PolicyVersionList', [])
+                    if not version['IsDefaultVersion']
+                ]}
             )
 
-        if not response['IsTruncated']:
-            finished = True
-        else:
-            next_token = response['Marker']
-
-        for res in response['Policies']:
-            if len(include) > 0 and len(exclude) > 0:
-                if res['PolicyName'].find(include) != -1 and res['PolicyName'].find(exclude) == -1:
-                    out['Policies'].append({'Name': res['PolicyName'], 'Arn': res['Arn']})
-            elif len(include) > 0 and res['PolicyName'].find(include) != -1:
-                out['Policies'].append({'Name': res['PolicyName'], 'Arn': res['Arn']})
-            elif len(exclude) > 0 and res['PolicyName'].find(exclude) == -1:
-                out['Policies'].append({'Name': res['PolicyName'], 'Arn': res['Arn']})
+def resource_from_arn(resource_id, arn, tags):
+    "This function returns the role or policy described by the tagged ARN"
+    res_type = 'iam_role' if arn.split(':')[5].startswith('role/') else 'iam_policy'
+    return records.record(resource_id.split('/')[-1], arn=arn, type=res_type)
+
+def group_resources(resources_list):
+    "This function groups roles and policies returned by resource_from_arn() like list_resources() does"
+    out = {}
+    out['Roles'] = [res for res in resources_list if res.type == 'iam_role']
+    out['Policies'] = [res for res in resources_list if res.type == 'iam_policy']
+    if not out['Roles'] and not out['Policies']:
+        out = []
     return out
 
-def remove_resource(client, res_type, res, dry_run=True):
-    "This function removes Glue db or emulates removal if global dry_run_flag is set to True"
+def list_role_attachments(client, role_name):
+    "This function returns managed policies, inline policies and instance profiles of the role"
     out = {}
-    out['Name'] = res['Name']
-    out['Arn'] = res['Arn']
-    out['Type'] = res_type
-    out['Reason'] = ''
+    out['AttachedPolicies'] = [
+        att['PolicyArn'] for att in pagination.paginate(
+            client,
+            'list_attached_role_policies',
+            'AttachedPolicies',
+            page_size=1000,
+            RoleName=role_name
+        )
+    ]
+    out['RolePolicies'] = list(pagination.paginate(
+        client,
+        'list_role_policies',
+        'PolicyNames',
+        page_size=1000,
+        RoleName=role_name
+    ))
+    out['InstanceProfiles'] = [
+        profile['InstanceProfileName'] for profile in pagination.paginate(
+            client,
+            'list_instance_profiles_for_role',
+            'InstanceProfiles',
+            page_size=1000,
+            RoleName=role_name
+        )
+    ]
+    return out
+
+def detach_role(client, role_name, attachments):
+    "This function detaches managed policies, deletes inline policies and removes the role from instance profiles"
+    calls = []
+    for policy_arn in attachments['AttachedPolicies']:
+        calls.append(('detach_role_policy', {'RoleName': role_name, 'PolicyArn': policy_arn}))
+    for policy_name in attachments['RolePolicies']:
+        calls.append(('delete_role_policy', {'RoleName': role_name, 'PolicyName': policy_name}))
+    for profile_name in attachments['InstanceProfiles']:
+        calls.append(('remove_role_from_instance_profile', {'RoleName': role_name, 'InstanceProfileName': profile_name}))
+
+    for operation, kwargs in calls:
+        try:
+            ratelimit.call(client, operation, **kwargs)
+        except Exception as e:
+            # The attachment is already gone, nothing to remove
+            if error_code(e) != 'NoSuchEntity':
+                raise
+    return len(calls)
+
+def remove_role(client, role_name, attachments=None):
+    "This function removes all attachments of the role and the role itself, attachments are listed if not known"
+    listed = attachments is None
+    if listed:
+        # Collect attachments first, detaching while paging would shift the markers
+        attachments = list_role_attachments(client, role_name)
+    detach_role(client, role_name, attachments)
+    try:
+        ratelimit.call(
+            client,
+            'delete_role',
+            RoleName=role_name
+        )
+    except Exception as e:
+        # The role was attached to something after discovery, list its attachments and try again
+        if listed or error_code(e) != 'DeleteConflict':
+            raise
+        remove_role(client, role_name)
+
+def list_policy_versions(client, policy_arn):
+    "This function returns IDs of the policy versions except the default one"
+    versions = pagination.paginate(
+        client,
+        'list_policy_versions',
+        'Versions',
+        page_size=1000,
+        PolicyArn=policy_arn
+    )
+    return [version['VersionId'] for version in versions if not version['IsDefaultVersion']]
+
+def remove_policy(client, policy_arn, versions=None):
+    "This function removes non-default versions of the policy and the policy itself, versions are listed if not known"
+    if versions is None:
+        versions = list_policy_versions(client, policy_arn)
+    for version_id in versions:
+        try:
+            ratelimit.call(
+                client,
+                'delete_policy_version',
+                PolicyArn=policy_arn,
+                VersionId=version_id
+            )
+        except Exception as e:
+            if error_code(e) != 'NoSuchEntity':
+                raise
+    ratelimit.call(
+        client,
+        'delete_policy',
+        PolicyArn=policy_arn
+    )
+
+def remove_resource(client, res_type, res, dry_run=True):
+    "This function removes IAM role or policy or emulates removal if global dry_run_flag is set to True"
+    out = res.entry()
+    out.type = res_type
     
     if dry_run:
-        out['Result'] = "dryrun_success"
+        out.result = "dryrun_success"
     else:
         try:
             if res_type == 'iam_role':
-                response = client.list_attached_role_policies(
-                    RoleName=res['Name']
-                )
-                for att in response['AttachedPolicies']:
-                    client.detach_role_policy(
-                        RoleName=res['Name'],
-                        PolicyArn=att['PolicyArn']
-                    )
-                client.delete_role(
-                    RoleName=res['Name']
-                )
+                remove_role(client, res.name, res.get('Attachments'))
             elif res_type == 'iam_policy':
-                client.delete_policy(
-                    PolicyArn=res['Arn']
-                )
+                remove_policy(client, res.arn, res.get('Versions'))
             else:
-                out['Result'] = "error"
-                out['Reason'] = "Unknown resource type"
+                out.result = "error"
+                out.reason = "Unknown resource type"
         except Exception as e:
-            out['Result'] = "error"
-            out['Reason'] = str(e)
+            out.result = "error"
+            out.reason = error_reason(e)
         else: 
-            out['Result'] = "success"
+            out.result = "success"
     return(out)
 
 if __name__ == "__main__":
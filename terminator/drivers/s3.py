@@ -1,84 +1,154 @@
-import boto3
+import concurrent.futures
 import sys
+from terminator import clients
+from terminator import executor
+from terminator import pagination
+from terminator import ratelimit
+from terminator import records
+from terminator.drivers import manifest
+from terminator.errors import error_reason
 
-__all__ = ['help_string', 'prepare', 'process', 'print_prepare_message', 'print_report']
+__all__ = ['prepare', 'process', 'print_prepare_message', 'print_report']
 
-priority = 10 # The driver execution priority (drivers are processed from lowest to highest value)
+depends = ['codebuild', 'glue_crawlers', 'glue_jobs'] # Drivers whose resources are processed before the resources of this driver
+concurrency = 8 # The maximum number of resources removed simultaneously
+arn_types = ['s3'] # Resource types of the driver in the Resource Groups Tagging API
+regional = False # Resources are global and processed once for all regions
+
+_batch_size = 1000 # The maximum number of keys removed with a single DeleteObjects call
+_delete_concurrency = 4 # The number of DeleteObjects calls kept in flight for each bucket
 
 _name = "s3"
-_description = "S3 Buckets"
+_description = manifest[_name]['description']
 
-def help_string():
-    whitespace_len = 25-len(_name)
-    return "  --%s%s%s" % (_name, ' '*whitespace_len, _description)
+priority = manifest[_name]['priority'] # The driver priority, drivers are listed from lowest to highest value
 
-def prepare(include, exclude):
+def prepare(match, region=None, session=None):
     out = []
-    s3 = boto3.client('s3');
-    out = list_buckets(s3, include, exclude)
+    s3 = clients.get_client('s3', region, session)
+    out = list_buckets(s3, match)
     return out
 
-def process(buckets_list, dry_run=True):
-    out = []
-    s3 = boto3.client('s3')
-    for bucket in buckets_list:
-        out.append(remove_bucket(s3, bucket, dry_run))
-    return out
+def inventory(region=None, session=None):
+    "Returns the list of all resources, regardless of include and exclude patterns"
+    client = clients.get_client('s3', region, session)
+    return list(iterate_resources(client))
+
+def process(buckets_list, dry_run=True, workers=1, region=None, session=None):
+    s3 = clients.get_client('s3', region, session)
+    return executor.bounded_imap(
+        lambda bucket: remove_bucket(s3, bucket, dry_run),
+        buckets_list,
+        workers
+    )
 
 def print_prepare_message(resources_list):
     if resources_list:
         print("%s:" % (_description))
         for obj in resources_list:
-            print("  %s" % (obj))
+            print("  %s" % (obj.name))
     return True
 
 def print_report(report):
     if report:
         print("%s:" % (_description))
         for obj in report:
-            if (obj['Reason']):
-                result_string = "%s (%s)" % (obj['Result'], obj['Reason'])
+            if (obj.reason):
+                result_string = "%s (%s)" % (obj.result, obj.reason)
             else:
-                result_string = obj['Result']
-            print("  %s - %s" % (obj['Name'], result_string))
+                result_string = obj.result
+            print("  %s - %s" % (obj.name, result_string))
     return True
 
-def list_buckets(client, include, exclude):
+def list_buckets(client, match):
     "This function returns list of S3 buckets matching include and exclude patterns"
     out = []
-    response = client.list_buckets()
-
-    for bucket in response['Buckets']:
-        if len(include) > 0 and len(exclude) > 0:
-            if bucket['Name'].find(include) != -1 and bucket['Name'].find(exclude) == -1:
-                out.append(bucket['Name'])
-        elif len(include) > 0 and len(exclude) == 0:
-            if bucket['Name'].find(include) != -1:
-                out.append(bucket['Name'])
-        elif len(include) == 0 and len(exclude) > 0:
-            if bucket['Name'].find(exclude) == -1:
-                out.append(bucket['Name'])
-    return(out)
+
+    if not match:
+        return out
+
+    for res in iterate_resources(client):
+        if match(res.name):
+            out.append(res)
+    return out
+
+def iterate_versions(client, bucket):
+    "This function yields every object version and delete marker of S3 bucket"
+    paginator = client.get_paginator('list_object_versions')
+    for page in paginator.paginate(Bucket=bucket):
+        for obj in page.get('Versions', []):
+            yield {'Key': obj['Key'], 'VersionId': obj['VersionId']}
+        for obj in page.get('DeleteMarkers', []):
+            yield {'Key': obj['Key'], 'VersionId': obj['VersionId']}
+
+def iterate_batches(objects, size=_batch_size):
+    "This function groups objects into lists of at most size elements"
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def delete_batch(client, bucket, batch):
+    "This function removes a batch of object versions, returns the number of keys failed to remove"
+    response = ratelimit.call(
+        client,
+        'delete_objects',
+        Bucket=bucket,
+        Delete={
+            'Objects': batch,
+            'Quiet': True
+        }
+    )
+    return len(response.get('Errors', []))
+
+def empty_bucket(client, bucket):
+    "This function removes all objects from S3 bucket, returns the number of keys failed to remove"
+    errors = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=_delete_concurrency) as pool:
+        for failed in executor.bounded_imap(
+            lambda batch: delete_batch(client, bucket, batch),
+            iterate_batches(iterate_versions(client, bucket)),
+            _delete_concurrency,
+            pool
+        ):
+            errors += failed
+    return errors
+
+def iterate_resources(client):
+    "This function yields all resources"
+    for bucket in pagination.paginate(client, 'list_buckets', 'Buckets'):
+        yield records.record(bucket['Name'], type=_name)
+
+def resource_from_arn(resource_id, arn, tags):
+    "This function returns the bucket described by the tagged ARN"
+    return records.record(resource_id, type=_name)
 
 def remove_bucket(client, bucket, dry_run=True):
-    "This function removes S3 bucket or emulates removal if global dry_run_flag is set to True"
-    out = {}
-    out['Name'] = bucket
-    out['Type'] = _name
-    out['Reason'] = ''
+    "This function empties and removes S3 bucket or emulates removal if global dry_run_flag is set to True"
+    out = bucket.entry()
     if dry_run: 
-        out['Result'] = "dryrun_success"
+        out.result = "dryrun_success"
     else:
         try:
-            client.delete_bucket(
-                Bucket=bucket
+            errors = empty_bucket(client, bucket.name)
+            if errors:
+                out.result = "error"
+                out.reason = "%d objects could not be removed" % (errors)
+                return(out)
+            ratelimit.call(
+                client,
+                'delete_bucket',
+                Bucket=bucket.name
             )
         except Exception as e:
-            out['Result'] = "error"
-            out['Reason'] = str(e)
-#            out['Reason'] = e.__class__
+            out.result = "error"
+            out.reason = error_reason(e)
         else: 
-            out['Result'] = "success"
+            out.result = "success"
     return(out)
 
 if __name__ == "__main__":
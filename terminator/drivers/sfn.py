@@ -1,100 +1,106 @@
-import boto3
 import sys
+from terminator import clients
+from terminator import executor
+from terminator import pagination
+from terminator import ratelimit
+from terminator import records
+from terminator.drivers import manifest
+from terminator.errors import error_reason
 
-__all__ = ['help_string', 'prepare', 'process', 'print_prepare_message', 'print_report']
+__all__ = ['prepare', 'process', 'print_prepare_message', 'print_report']
 
-priority = 1 # The driver execution priority (drivers are processed from lowest to highest value)
+depends = [] # Drivers whose resources are processed before the resources of this driver
+concurrency = 10 # The maximum number of resources removed simultaneously
+arn_types = ['states:stateMachine'] # Resource types of the driver in the Resource Groups Tagging API
+service = 'stepfunctions' # The AWS service of the driver's resources
 
 _name = "sfn"
-_description = "Step functions"
+_description = manifest[_name]['description']
 
-def help_string():
-    whitespace_len = 25-len(_name)
-    return "  --%s%s%s" % (_name, ' '*whitespace_len, _description)
+priority = manifest[_name]['priority'] # The driver priority, drivers are listed from lowest to highest value
 
-def prepare(include, exclude):
-    client = boto3.client('stepfunctions');
-    out = list_state_machines(client, include, exclude)
+def prepare(match, region=None, session=None):
+    client = clients.get_client('stepfunctions', region, session)
+    out = list_state_machines(client, match)
     return out
 
-def process(state_machines_list, dry_run=True):
-    out = []
-    client = boto3.client('stepfunctions')
-    for state_machine in state_machines_list:
-        out.append(remove_state_machine(client, state_machine, dry_run))
-    return out
+def inventory(region=None, session=None):
+    "Returns the list of all resources, regardless of include and exclude patterns"
+    client = clients.get_client('stepfunctions', region, session)
+    return list(iterate_resources(client))
+
+def process(state_machines_list, dry_run=True, workers=1, region=None, session=None):
+    client = clients.get_client('stepfunctions', region, session)
+    return executor.bounded_imap(
+        lambda state_machine: remove_state_machine(client, state_machine, dry_run),
+        state_machines_list,
+        workers
+    )
 
 def print_prepare_message(resources_list):
     if resources_list:
         print("%s:" % (_description))
         for obj in resources_list:
-            print("  %s (%s)" % (obj['Name'], obj['Arn']))
+            print("  %s (%s)" % (obj.name, obj.arn))
     return True
 
 def print_report(report):
     if report:
         print("%s:" % (_description))
         for obj in report:
-            if (obj['Reason']):
-                result_string = "%s (%s)" % (obj['Result'], obj['Reason'])
+            if (obj.reason):
+                result_string = "%s (%s)" % (obj.result, obj.reason)
             else:
-                result_string = obj['Result']
-            print("  %s (%s) - %s" % (obj['Name'], obj['Arn'], result_string))
+                result_string = obj.result
+            print("  %s (%s) - %s" % (obj.name, obj.arn, result_string))
     return True
 
-# TODO: implement continuation token usage (to process more than 1000 objects)
-def list_state_machines(client, include, exclude):
+def list_state_machines(client, match):
     "This function returns list of Step function state machines matching include and exclude patterns"
     out = []
 
-    if len(include) == 0 and len(exclude) == 0:
+    if not match:
         return out
 
-    response = client.list_state_machines(
-        maxResults=1000
-    )
-
-    for state_machine in response['stateMachines']:
-        if len(include) > 0 and len(exclude) > 0:
-            if state_machine['name'].find(include) != -1 and state_machine['name'].find(exclude) == -1:
-                out.append({
-                    'Name': state_machine['name'],
-                    'Arn': state_machine['stateMachineArn']
-                })
-        elif len(include) > 0 and state_machine['name'].find(include) != -1:
-            out.append({
-                'Name': state_machine['name'],
-                'Arn': state_machine['stateMachineArn']
-            })
-        elif len(exclude) > 0 and state_machine['name'].find(exclude) == -1:
-            out.append({
-                'Name': state_machine['name'],
-                'Arn': state_machine['stateMachineArn']
-            })
+    for res in iterate_resources(client):
+        if match(res.name):
+            out.append(res)
     return out
 
+def iterate_resources(client):
+    "This function yields all resources"
+    for state_machine in pagination.paginate(client, 'list_state_machines', 'stateMachines', page_size=1000):
+        yield records.record(state_machine['name'], arn=state_machine['stateMachineArn'], type=_name)
+
+def existing(report, region=None, session=None):
+    "This function returns report entries of state machines which still exist, checked with a single listing"
+    client = clients.get_client('stepfunctions', region, session)
+    state_machines = set(res.arn for res in iterate_resources(client))
+    return [entry for entry in report if entry.arn in state_machines]
+
+def resource_from_arn(resource_id, arn, tags):
+    "This function returns the state machine described by the tagged ARN"
+    return records.record(resource_id, arn=arn, type=_name)
+
+def delete_call(state_machine):
+    "This function returns the operation and its arguments removing Step function state machine"
+    return 'delete_state_machine', {'stateMachineArn': state_machine.arn}
+
 def remove_state_machine(client, state_machine, dry_run=True):
     "This function removes Step function state machine or emulates removal if global dry_run_flag is set to True"
-    out = {}
-    out['Name'] = state_machine['Name']
-    out['Arn'] = state_machine['Arn']
-    out['Type'] = _name
-    out['Reason'] = ''
-
-    print(state_machine)
-    
+    out = state_machine.entry()
+
     if dry_run:
-        out['Result'] = "dryrun_success"
+        out.result = "dryrun_success"
     else:
         try:
-            client.delete_state_machine(
-                stateMachineArn=state_machine['Arn']
-            )
+            operation, kwargs = delete_call(state_machine)
+            ratelimit.call(client, operation, **kwargs)
         except Exception as e:
-            out['Result'] = "error"
-            out['Reason'] = e.__class__
+            out.result = "error"
+            out.reason = error_reason(e)
         else: 
-            out['Result'] = "success"
+            out.result = "success"
 
     return(out)
 
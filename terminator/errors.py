@@ -0,0 +1,10 @@
+def error_code(e):
+    "Returns the AWS error code of the exception or None"
+    response = getattr(e, 'response', None)
+    if not response:
+        return None
+    return response.get('Error', {}).get('Code')
+
+def error_reason(e):
+    "Returns the reason of a failed call reported for the resource, the AWS error code or the exception class name"
+    return error_code(e) or e.__class__.__name__
@@ -0,0 +1,76 @@
+import collections
+import concurrent.futures
+import threading
+
+default_workers = 16 # Default number of worker threads used by the terminator
+
+_pool = None
+_pool_size = default_workers
+_pool_lock = threading.Lock()
+
+def set_pool_size(workers):
+    "Set the size of the shared worker pool, must be called before the pool is used"
+    global _pool_size
+    _pool_size = max(1, workers)
+    return _pool_size
+
+def get_pool_size():
+    "Returns the size of the shared worker pool"
+    return _pool_size
+
+def get_pool():
+    "Returns the shared worker pool, creating it on first use"
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=_pool_size,
+                thread_name_prefix='terminator'
+            )
+        return _pool
+
+def bounded_imap(func, items, limit=1, pool=None):
+    "Yield func(item) for every item in the original order, keeping at most limit calls in flight"
+    if limit <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    if pool is None:
+        pool = get_pool()
+    pending = collections.deque()
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def bounded_map(func, items, limit=1, pool=None):
+    "Returns the list of func(item) results for every item, keeping at most limit calls in flight"
+    return list(bounded_imap(func, items, limit, pool))
+
+def prepare_all(objects, workers=default_workers):
+    "Run prepare() of every terminator object concurrently, return resources keyed like objects"
+    out = {}
+    if not objects:
+        return out
+
+    workers = max(1, min(workers, len(objects)))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for key, obj in objects.items():
+            futures[pool.submit(obj.prepare)] = key
+        for future in concurrent.futures.as_completed(futures):
+            out[futures[future]] = future.result()
+    return out
+
+def process_all(groups, dry_run=True, output=None):
+    "Process terminator objects of all regions, every object starts as soon as the drivers it depends on are done"
+    objects = []
+    for group in groups.values():
+        objects.extend(obj for obj in group if obj.has_resources())
+
+    from terminator import scheduler
+    scheduler.run(objects, lambda obj: obj.process(dry_run, output), get_pool_size())
+    return groups
@@ -0,0 +1,139 @@
+import json
+import sqlite3
+import threading
+import time
+from terminator import accounts
+from terminator import clients
+from terminator import records
+
+default_ttl = 900 # Inventory entries younger than this number of seconds are reused instead of listing again
+
+_schema = """
+CREATE TABLE IF NOT EXISTS listings (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    service TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (account, region, service)
+);
+CREATE TABLE IF NOT EXISTS resources (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    service TEXT NOT NULL,
+    name TEXT NOT NULL,
+    identity TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resources_index ON resources (account, region, service, name);
+CREATE INDEX IF NOT EXISTS resources_identity ON resources (account, region, service, identity);
+"""
+
+class inventory(object):
+    "Local SQLite store of discovered resources, indexed by account, region, service and name or identity"
+
+    def __init__(self, path, ttl=default_ttl):
+        "Constructor"
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.accounts = {}
+        self.accounts_lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self.lock, self.db:
+            # Listings stored before resources had an identity are dropped and listed again
+            columns = [row[1] for row in self.db.execute("PRAGMA table_info(resources)")]
+            if columns and 'identity' not in columns:
+                self.db.executescript("DROP TABLE resources; DELETE FROM listings;")
+            self.db.executescript(_schema)
+
+    def close(self):
+        "Close the database"
+        with self.lock:
+            self.db.close()
+
+    def get_key(self, obj):
+        "Returns the (account, region, service) key of the terminator object"
+        session_key = id(obj.session)
+        with self.accounts_lock:
+            if session_key not in self.accounts:
+                self.accounts[session_key] = accounts.get_account_id(obj.session)
+        if not obj.regional:
+            region = 'global'
+        elif obj.region:
+            region = obj.region
+        else:
+            region = clients.get_client('sts', None, obj.session).meta.region_name
+        return self.accounts[session_key], region, obj.driver
+
+    def is_fresh(self, key):
+        "Returns True if the listing of the key is younger than the TTL"
+        with self.lock:
+            row = self.db.execute(
+                "SELECT updated FROM listings WHERE account = ? AND region = ? AND service = ?",
+                key
+            ).fetchone()
+        return row is not None and time.time() - row[0] < self.ttl
+
+    def store(self, key, resources):
+        "Replace the stored listing of the key with the resources"
+        rows = [key + (res.name, identity(res), json.dumps(res.to_dict())) for res in resources]
+        with self.lock, self.db:
+            self.db.execute(
+                "DELETE FROM resources WHERE account = ? AND region = ? AND service = ?",
+                key
+            )
+            self.db.executemany(
+                "INSERT INTO resources (account, region, service, name, identity, data) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO listings (account, region, service, updated) VALUES (?, ?, ?, ?)",
+                key + (time.time(),)
+            )
+        return len(rows)
+
+    def query(self, key, match):
+        "Returns stored resources of the key with name matching include and exclude patterns"
+        if not match:
+            return []
+        sql = "SELECT name, data FROM resources WHERE account = ? AND region = ? AND service = ?"
+        args = list(key)
+        # A single substring include is filtered by SQLite, other patterns only by the matcher
+        include = match.literal_include()
+        if include is not None:
+            sql += " AND instr(name, ?) > 0"
+            args.append(include)
+        with self.lock:
+            rows = self.db.execute(sql + " ORDER BY rowid", args).fetchall()
+        return [records.from_dict(json.loads(data)) for name, data in rows if match(name)]
+
+    def forget(self, key, identities):
+        "Remove resources with the identities from the stored listing of the key"
+        with self.lock, self.db:
+            self.db.executemany(
+                "DELETE FROM resources WHERE account = ? AND region = ? AND service = ? AND identity = ?",
+                [key + (value,) for value in identities]
+            )
+        return True
+
+    def prepare(self, obj):
+        "Returns resources of the terminator object, listing the service only if its stored listing is stale"
+        key = self.get_key(obj)
+        if not self.is_fresh(key):
+            self.store(key, obj.drv.inventory(obj.region, obj.session))
+        out = self.query(key, obj.match)
+        if hasattr(obj.drv, 'group_resources'):
+            out = obj.drv.group_resources(out)
+        return out
+
+    def update(self, obj, report):
+        "Remove resources removed successfully according to the report from the stored listing"
+        # Names are not unique, EC2 instances may share the Name tag and IAM roles and policies share the service
+        identities = [identity(entry) for entry in report if entry.result == 'success']
+        if identities:
+            self.forget(self.get_key(obj), identities)
+        return True
+
+def identity(res):
+    "Returns the unique identity of the resource or its report entry as stored in the inventory"
+    return json.dumps(res.key())
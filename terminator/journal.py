@@ -0,0 +1,99 @@
+import collections
+import json
+import os
+import threading
+import time
+from terminator import records
+
+default_batch = 100 # Completed deletions written before the journal is synced to disk
+default_interval = 1.0 # Seconds after which written deletions are synced to disk, however few there are
+
+class journal(object):
+    "Append-only JSON Lines journal of planned and completed deletions, synced to disk in batches"
+
+    def __init__(self, path, batch=default_batch, interval=default_interval):
+        "Constructor"
+        self.path = path
+        self.batch = batch
+        self.interval = interval
+        self.stream = open(path, "a")
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.synced = time.monotonic()
+
+    def close(self):
+        "Sync and close the journal"
+        with self.lock:
+            if self.stream.closed:
+                return False
+            self.sync()
+            self.stream.close()
+        return True
+
+    def sync(self):
+        "Write buffered lines to disk, the caller holds the lock"
+        self.stream.flush()
+        os.fsync(self.stream.fileno())
+        self.pending = 0
+        self.synced = time.monotonic()
+
+    def write(self, events, sync=False):
+        "Append the events, syncing the journal once the batch is full or the interval has passed"
+        if not events:
+            return False
+        data = ''.join(json.dumps(event) + "\n" for event in events)
+        with self.lock:
+            self.stream.write(data)
+            self.pending += len(events)
+            if sync or self.pending >= self.batch or time.monotonic() - self.synced >= self.interval:
+                self.sync()
+        return True
+
+    def plan(self, objects):
+        "Record every resource of the terminator objects as planned, synced before any of them is removed"
+        return self.write([event('plan', obj, res) for obj in objects for res in obj.resource_list()], True)
+
+    def done(self, obj, entry):
+        "Record the report entry of the terminator object's resource as completed"
+        return self.write([event('done', obj, entry)])
+
+    def track(self, obj, results):
+        "Yield the report entries, recording every one as completed"
+        for entry in results:
+            self.done(obj, entry)
+            yield entry
+
+def event(kind, obj, res):
+    "Returns the journal line of the resource or report entry of the terminator object"
+    return {
+        'Event': kind,
+        'Driver': obj.driver,
+        'Region': obj.region,
+        'Record': res.to_dict(),
+    }
+
+def load(path):
+    "Returns flat lists of resources planned in the journal and not removed successfully yet, keyed by (region, driver) in planned order"
+    planned = collections.OrderedDict()
+    removed = set()
+    with open(path) as f:
+        for line in f:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                # The last line may be torn if the run died while writing it
+                continue
+            key = (item['Region'], item['Driver'])
+            res = records.from_dict(item['Record'])
+            if item['Event'] == 'plan':
+                # A resumed run plans its remaining resources again
+                planned.setdefault(key, collections.OrderedDict())[res.key()] = res
+            elif item['Event'] == 'done' and res.result == 'success':
+                removed.add(key + res.key())
+
+    out = collections.OrderedDict()
+    for key, resources in planned.items():
+        left = [res for res_key, res in resources.items() if key + res_key not in removed]
+        if left:
+            out[key] = left
+    return out
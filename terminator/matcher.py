@@ -0,0 +1,137 @@
+import fnmatch
+import re
+import threading
+
+# Pattern prefixes, patterns without a prefix are substrings of the name
+_kinds = ('exact:', 'glob:', 're:')
+_default_flags = re.compile('').flags # Flags of regexes without inline flags
+
+def load_patterns(path):
+    "Returns patterns listed in the file, one per line, blank lines and lines starting with # are skipped"
+    out = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                out.append(line)
+    return out
+
+def expand_patterns(patterns):
+    "Returns the list of patterns with @file references replaced by patterns from the file"
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    out = []
+    for pattern in patterns:
+        if pattern.startswith('@'):
+            out.extend(load_patterns(pattern[1:]))
+        elif pattern:
+            out.append(pattern)
+    return out
+
+def _literals_regex(literals):
+    "Returns regex matching any of the literals, built from their prefix tree so each name is scanned once"
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        # A shorter literal already matches, longer ones sharing its prefix are not needed
+        if '' in node:
+            return ''
+        alternatives = [re.escape(char) + build(node[char]) for char in sorted(node.keys())]
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return '(?:' + '|'.join(alternatives) + ')'
+
+    return re.compile(build(trie))
+
+class pattern_set(object):
+    "Compiled set of substring, exact, glob and regex patterns"
+
+    def __init__(self, patterns):
+        "Constructor"
+        self.patterns = expand_patterns(patterns)
+        self.exact = set()
+        literals = []
+        globs = []
+        regexes = []
+        for pattern in self.patterns:
+            if pattern.startswith('exact:'):
+                self.exact.add(pattern[len('exact:'):])
+            elif pattern.startswith('glob:'):
+                globs.append(fnmatch.translate(pattern[len('glob:'):]))
+            elif pattern.startswith('re:'):
+                regexes.append(pattern[len('re:'):])
+            else:
+                literals.append(pattern)
+
+        self.literals = literals
+        self.searches = []
+        if literals:
+            self.searches.append(_literals_regex(literals).search)
+        if globs:
+            self.searches.append(re.compile('|'.join(globs)).match)
+        # Regexes with groups, back references or inline flags would change meaning in an alternation, they are searched one by one
+        combined = []
+        for regex in regexes:
+            compiled = re.compile(regex)
+            if compiled.groups or compiled.flags != _default_flags:
+                self.searches.append(compiled.search)
+            else:
+                combined.append(regex)
+        if combined:
+            self.searches.append(re.compile('|'.join('(?:%s)' % regex for regex in combined)).search)
+
+    def __bool__(self):
+        return bool(self.patterns)
+
+    def search(self, name):
+        "Returns True if any pattern matches the name"
+        if name in self.exact:
+            return True
+        for search in self.searches:
+            if search(name):
+                return True
+        return False
+
+class matcher(object):
+    "Matches resource names against include and exclude patterns"
+
+    def __init__(self, include=[], exclude=[]):
+        "Constructor"
+        self.include = pattern_set(include)
+        self.exclude = pattern_set(exclude)
+
+    def __bool__(self):
+        "Returns False if there are no patterns, no resources are matched then"
+        return bool(self.include) or bool(self.exclude)
+
+    def __call__(self, name):
+        "Returns True if the name matches any include pattern and no exclude pattern"
+        if not self:
+            return False
+        if self.include and not self.include.search(name):
+            return False
+        if self.exclude and self.exclude.search(name):
+            return False
+        return True
+
+    def literal_include(self):
+        "Returns the include pattern if it is a single substring, or None"
+        if len(self.include.patterns) == 1 and len(self.include.literals) == 1:
+            return self.include.literals[0]
+        return None
+
+_cache = {}
+_lock = threading.Lock()
+
+def get(include, exclude):
+    "Returns the compiled matcher for include and exclude patterns, every pattern list is compiled once"
+    key = (tuple(expand_patterns(include)), tuple(expand_patterns(exclude)))
+    with _lock:
+        if key not in _cache:
+            _cache[key] = matcher(key[0], key[1])
+        return _cache[key]
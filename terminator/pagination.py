@@ -0,0 +1,17 @@
+def paginate_pages(client, operation, page_size=None, **kwargs):
+    "Yield every page of the operation, a single response if the operation can not be paginated"
+    if not client.can_paginate(operation):
+        yield getattr(client, operation)(**kwargs)
+        return
+
+    if page_size:
+        kwargs['PaginationConfig'] = {'PageSize': page_size}
+    paginator = client.get_paginator(operation)
+    for page in paginator.paginate(**kwargs):
+        yield page
+
+def paginate(client, operation, key, page_size=None, **kwargs):
+    "Yield the items stored under key in every page of the operation, one page at a time"
+    for page in paginate_pages(client, operation, page_size, **kwargs):
+        for item in page.get(key, []):
+            yield item
@@ -0,0 +1,70 @@
+import json
+import os
+import time
+import terminator
+from terminator import records
+
+version = 1 # Version of the plan file format, plans of other versions are refused
+
+def to_dict(objects, account=None):
+    "Returns the plan of the terminator objects' resources as JSON serializable dict, objects are sorted by priority"
+    out = {'Version': version, 'Created': time.time(), 'Objects': []}
+    for obj in sorted(objects, key=lambda obj: obj.priority):
+        if not obj.has_resources():
+            continue
+        out['Objects'].append({
+            'Driver': obj.driver,
+            'Priority': obj.priority,
+            'Region': obj.region,
+            'Account': account,
+            'Resources': [res.to_dict() for res in obj.resource_list()],
+        })
+    return out
+
+def write(path, objects, account=None):
+    "Write the plan of the terminator objects' resources to the file, returns the number of resources planned"
+    data = to_dict(objects, account)
+    # The file is replaced at once, so a plan is never applied half written
+    temp = "%s.%d.tmp" % (path, os.getpid())
+    with open(temp, "w") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    os.replace(temp, path)
+    return sum(len(item['Resources']) for item in data['Objects'])
+
+def load(path):
+    "Returns the plan written by write(), with resources as records"
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('Version') != version:
+        raise ValueError("Unsupported plan version %s" % (data.get('Version')))
+    for item in data['Objects']:
+        if item['Driver'] not in terminator.get_drivers():
+            raise ValueError("Unknown driver %s" % (item['Driver']))
+        item['Resources'] = [records.from_dict(res) for res in item['Resources']]
+    return data
+
+def accounts(data):
+    "Returns the set of accounts the plan was made for"
+    return set(item['Account'] for item in data['Objects'] if item['Account'] is not None)
+
+def make_objects(items, include, exclude, store=None):
+    "Returns terminator objects keyed by (region, service) for (region, driver, resources) items, and the list of their regions"
+    objects = {}
+    regions = []
+    for region, driver, resources in items:
+        obj = terminator.terminator(driver, include, exclude, region, None, store)
+        obj.set_resources(resources)
+        objects[(obj.region, driver)] = obj
+        if obj.region is not None and obj.region not in regions:
+            regions.append(obj.region)
+    return objects, regions or [None]
+
+def get_objects(data, include, exclude, store=None):
+    "Returns terminator objects keyed by (region, service) with the planned resources, and the list of their regions"
+    return make_objects(
+        ((item['Region'], item['Driver'], item['Resources']) for item in data['Objects']),
+        include,
+        exclude,
+        store
+    )
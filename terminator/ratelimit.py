@@ -0,0 +1,146 @@
+import threading
+import time
+from terminator import clients
+from terminator.errors import error_code
+
+# Error codes returned by AWS services when requests are throttled
+throttling_errors = set([
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'TooManyRequestsException',
+    'RequestLimitExceeded',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'ProvisionedThroughputExceededException',
+    'LimitExceededException',
+    'SlowDown',
+    'EC2ThrottledException',
+])
+
+default_rate = 10.0 # Initial number of calls per second for every service operation
+min_rate = 0.02 # The rate is never reduced below this number of calls per second
+max_rate = 200.0 # The rate is never raised above this number of calls per second
+additive_increase = 0.2 # Calls per second added to the rate after every successful call
+multiplicative_decrease = 0.5 # The rate is multiplied by this factor after a throttled call, at most once per decrease window
+decrease_window = 2.0 # Seconds after a decrease in which throttled calls do not decrease the rate again
+max_requeues = 30 # Throttled call is retried at most this number of times before failing
+
+# Initial rates of operations known to have low limits
+initial_rates = {
+    ('apigateway', 'delete_rest_api'): 0.05,
+    ('iam', None): 5.0,
+}
+
+# Operations throttled separately for every value of the parameter, such as S3 requests for every bucket
+scoped_operations = {
+    ('s3', 'delete_objects'): 'Bucket',
+}
+
+class bucket(object):
+    "Token bucket with additive increase, multiplicative decrease (AIMD) rate control"
+
+    def __init__(self, rate=default_rate):
+        "Constructor"
+        self.rate = rate
+        # Incremented on every decrease, calls acquired before it do not decrease the rate again
+        self.generation = 0
+        self.decreased = None
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        capacity = max(1.0, self.rate)
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        "Take a token if a call is allowed now, returns 0 or the number of seconds to wait before trying again"
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return 0
+            return (1.0 - self.tokens) / self.rate
+
+    def acquire(self):
+        "Wait until a call is allowed"
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return True
+            time.sleep(wait)
+
+    def success(self):
+        "Raise the rate after a successful call"
+        with self.lock:
+            self.rate = min(max_rate, self.rate + additive_increase)
+
+    def throttled(self, generation=None):
+        "Cut the rate and drop the accumulated tokens after a throttled call acquired in the generation, returns False if the rate was cut since"
+        with self.lock:
+            # Calls in flight when the rate was cut, and calls throttled shortly after, belong to the same burst
+            now = time.monotonic()
+            if generation is not None and generation != self.generation:
+                return False
+            if self.decreased is not None and now - self.decreased < decrease_window:
+                return False
+            self.rate = max(min_rate, self.rate * multiplicative_decrease)
+            self.tokens = min(self.tokens, 0.0)
+            self.generation += 1
+            self.decreased = now
+            return True
+
+_buckets = {}
+_lock = threading.Lock()
+
+def get_bucket(service, operation, region=None, credentials=None, scope=None):
+    "Returns the token bucket of the service operation in the region for the credentials, and for the scope of scoped operations"
+    with _lock:
+        # AWS throttles every account in every region separately
+        key = (service, operation, region, credentials, scope)
+        if key not in _buckets:
+            rate = initial_rates.get((service, operation), initial_rates.get((service, None), default_rate))
+            _buckets[key] = bucket(rate)
+        return _buckets[key]
+
+def client_bucket(client, operation, kwargs):
+    "Returns the token bucket of the client operation called with the arguments, shared by clients of the same service, region and credentials"
+    service = client.meta.service_model.service_name
+    scope = scoped_operations.get((service, operation))
+    return get_bucket(
+        service,
+        operation,
+        client.meta.region_name,
+        clients.client_credentials_key(client),
+        kwargs.get(scope) if scope else None
+    )
+
+def clear():
+    "Forget the rates learned for all service operations"
+    with _lock:
+        _buckets.clear()
+
+def is_throttling(e):
+    "Returns True if the exception is a throttling response"
+    return error_code(e) in throttling_errors
+
+def call(client, operation, **kwargs):
+    "Call the client operation at the rate allowed for it, throttled calls are queued again instead of failing"
+    limiter = client_bucket(client, operation, kwargs)
+    requeues = 0
+    while True:
+        limiter.acquire()
+        generation = limiter.generation
+        try:
+            response = getattr(client, operation)(**kwargs)
+        except Exception as e:
+            if not is_throttling(e) or requeues >= max_requeues:
+                raise
+            limiter.throttled(generation)
+            requeues += 1
+            continue
+        limiter.success()
+        return response
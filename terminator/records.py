@@ -0,0 +1,96 @@
+import sys
+
+# Fields of the dicts used for resources and report entries, and the record attributes holding them
+_fields = (
+    ('Name', 'name'),
+    ('Id', 'id'),
+    ('Arn', 'arn'),
+    ('Type', 'type'),
+    ('Result', 'result'),
+    ('Reason', 'reason'),
+)
+_attributes = dict(_fields)
+
+def _intern(value):
+    "Returns the shared copy of the code, so records loaded from JSON or pickles do not repeat it"
+    if value:
+        return sys.intern(value)
+    return value
+
+class record(object):
+    "Compact resource or report entry, the fields of the dicts used before are readable as items too"
+    __slots__ = ('name', 'id', 'arn', 'type', 'result', 'reason', 'data')
+
+    def __init__(self, name, id=None, arn=None, type=None, result=None, reason=None, data=None):
+        "Constructor"
+        self.name = name
+        self.id = id
+        self.arn = arn
+        self.type = _intern(type)
+        self.result = _intern(result)
+        self.reason = reason
+        # Driver specific fields, such as IAM role attachments
+        self.data = data
+
+    def __getstate__(self):
+        return tuple(getattr(self, attribute) for attribute in self.__slots__)
+
+    def __setstate__(self, state):
+        for attribute, value in zip(self.__slots__, state):
+            setattr(self, attribute, value)
+        self.type = _intern(self.type)
+        self.result = _intern(self.result)
+
+    def __getitem__(self, key):
+        "Returns the field like the dict did, for example record['Name']"
+        if key in _attributes:
+            value = getattr(self, _attributes[key])
+            if value is not None:
+                return value
+        elif self.data and key in self.data:
+            return self.data[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        "Returns the field like the dict did, or default if it is not set"
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return "record(%r)" % (self.to_dict())
+
+    def entry(self, result=None, reason=''):
+        "Returns the report entry of the resource"
+        return record(self.name, self.id, self.arn, self.type, result, reason)
+
+    def key(self):
+        "Returns the tuple identifying the resource"
+        return (self.type, self.name, self.id, self.arn)
+
+    def to_dict(self):
+        "Returns the record as dict with the fields that are set, as used before the records"
+        out = {}
+        for field, attribute in _fields:
+            value = getattr(self, attribute)
+            if value is not None:
+                out[field] = value
+        if self.data:
+            out.update(self.data)
+        return out
+
+def from_dict(value):
+    "Returns the record of the dict returned by to_dict(), or of the resource name stored by earlier versions"
+    if isinstance(value, str):
+        return record(value)
+    kwargs = {}
+    data = {}
+    for key, item in value.items():
+        if key in _attributes:
+            kwargs[_attributes[key]] = item
+        else:
+            data[key] = item
+    if data:
+        kwargs['data'] = data
+    return record(**kwargs)
@@ -0,0 +1,17 @@
+import collections
+from terminator import clients
+
+def get_regions():
+    "Returns the list of regions enabled for the account"
+    client = clients.get_client('ec2')
+    response = client.describe_regions()
+    return sorted(region['RegionName'] for region in response['Regions'])
+
+def group_by_region(objects, regions=[None]):
+    "Returns terminator objects grouped by region and sorted by priority, global resources come last"
+    out = collections.OrderedDict()
+    for region in list(regions) + [None]:
+        group = [obj for obj in objects if obj.region == region]
+        if group and region not in out:
+            out[region] = sorted(group, key=lambda obj: obj.priority)
+    return out
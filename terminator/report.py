@@ -0,0 +1,39 @@
+import json
+import sys
+import threading
+
+fields = ['Name', 'Id', 'Arn', 'Type', 'Result', 'Reason'] # Fields of every JSON Lines report entry
+
+class jsonl_writer(object):
+    "Writes report entries as JSON Lines, one entry per line as soon as the resource is processed"
+
+    def __init__(self, stream, account=None):
+        "Constructor"
+        self.stream = stream
+        self.account = account
+        self.lock = threading.Lock()
+
+    def write(self, obj, entry):
+        "Write the report entry of the terminator object's resource"
+        record = {}
+        for field in fields:
+            record[field] = entry.get(field)
+        if not record['Reason']:
+            record['Reason'] = None
+        record['Region'] = obj.region
+        if self.account is not None:
+            record['Account'] = self.account
+        line = json.dumps(record) + "\n"
+        # Lines of concurrent drivers are never mixed
+        with self.lock:
+            self.stream.write(line)
+            self.stream.flush()
+        return True
+
+def open_writer(output, account=None):
+    "Returns JSON Lines writer for the (format, path) tuple, writing to stdout if path is empty, or None"
+    if not output or output[0] != "jsonl":
+        return None
+    if output[1]:
+        return jsonl_writer(open(output[1], "a"), account)
+    return jsonl_writer(sys.__stdout__, account)
@@ -0,0 +1,84 @@
+import asyncio
+import concurrent.futures
+
+def depends_on(obj, other):
+    "Returns True if obj must be processed after other"
+    if other.driver not in obj.depends:
+        return False
+    # Global resources depend on regional ones in every region and vice versa
+    return obj.region == other.region or obj.region is None or other.region is None
+
+def dependencies(objects):
+    "Returns the set of indexes of objects every object depends on, keyed by the object index"
+    deps = {}
+    for i, obj in enumerate(objects):
+        deps[i] = set(j for j, other in enumerate(objects) if j != i and depends_on(obj, other))
+    return deps
+
+def cycle_error(objects, pending):
+    "Returns the error raised when the pending objects wait for each other"
+    return ValueError("Circular dependency between drivers: %s" % (', '.join(objects[i].driver for i in pending)))
+
+def stages(objects):
+    "Returns objects split into lists processed one after another, objects of every list depend only on objects of earlier lists"
+    objects = sorted(objects, key=lambda obj: obj.priority)
+    deps = dependencies(objects)
+
+    pending = list(range(len(objects)))
+    done = set()
+    out = []
+    while pending:
+        ready = [i for i in pending if deps[i] <= done]
+        if not ready:
+            raise cycle_error(objects, pending)
+        out.append([objects[i] for i in ready])
+        done.update(ready)
+        pending = [i for i in pending if i not in done]
+    return out
+
+def run(objects, func, workers=1):
+    "Run func for every object as soon as the objects it depends on are done, independent objects run concurrently"
+    objects = sorted(objects, key=lambda obj: obj.priority)
+    deps = dependencies(objects)
+
+    pending = list(range(len(objects)))
+    running = {}
+    done = set()
+    workers = max(1, min(workers, len(objects) or 1))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scheduler') as pool:
+        while pending or running:
+            for i in list(pending):
+                if deps[i] <= done:
+                    pending.remove(i)
+                    running[pool.submit(func, objects[i])] = i
+            if not running:
+                raise cycle_error(objects, pending)
+            finished, unused = concurrent.futures.wait(
+                running,
+                return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in finished:
+                future.result()
+                done.add(running.pop(future))
+    return objects
+
+async def run_async(objects, func):
+    "Await coroutine func for every object as soon as the objects it depends on are done, like run() on the event loop"
+    objects = sorted(objects, key=lambda obj: obj.priority)
+    deps = dependencies(objects)
+
+    pending = list(range(len(objects)))
+    running = {}
+    done = set()
+    while pending or running:
+        for i in list(pending):
+            if deps[i] <= done:
+                pending.remove(i)
+                running[asyncio.ensure_future(func(objects[i]))] = i
+        if not running:
+            raise cycle_error(objects, pending)
+        finished, unused = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in finished:
+            task.result()
+            done.add(running.pop(task))
+    return objects
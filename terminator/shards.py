@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import re
+import time
+import terminator
+from terminator import accounts
+from terminator import plan
+from terminator import records
+from terminator import scheduler
+from terminator import stats
+
+default_timeout = 21600 # Seconds to wait for other shards at a barrier or for their reports before giving up
+poll_interval = 1.0 # Seconds between checks of the shared directory
+
+def shard_of(res, count):
+    "Returns the shard of the resource, the same in every process and on every host"
+    key = "\0".join(str(value) for value in res.key())
+    digest = hashlib.sha1(key.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count
+
+def valid_run_id(run_id):
+    "Returns True if the run ID may name a directory"
+    return bool(re.match(r'^[A-Za-z0-9_.-]+$', run_id)) and run_id not in ('.', '..')
+
+def new_run_id():
+    "Returns run ID of a local run, unique on the host"
+    return "%s-%d" % (time.strftime("%Y%m%d%H%M%S"), os.getpid())
+
+def run_dir(directory, path, run_id):
+    "Returns the directory shared by the shards of the run applying the plan file, named after the plan contents and the run ID"
+    with open(path, 'rb') as f:
+        plan_id = hashlib.sha1(f.read()).hexdigest()[:16]
+    return os.path.join(directory, "%s-%s" % (plan_id, run_id))
+
+def stale(directory, shard):
+    "Returns names of files the shard left in the run directory, if it ran there before"
+    if not os.path.isdir(directory):
+        return []
+    pattern = re.compile(r'^(done-\d+-%d|failed-%d|report-%d\.json)$' % (shard, shard, shard))
+    return sorted(name for name in os.listdir(directory) if pattern.match(name))
+
+def stages(objects):
+    "Returns lists of (object, group) tuples processed between barriers, group is the resource type of drivers grouping resources by type, or None"
+    out = []
+    for stage in scheduler.stages(objects):
+        # Drivers grouping resources process the groups in order, IAM roles before policies
+        steps = [[]]
+        for obj in stage:
+            if isinstance(obj.resources, dict):
+                for i, group in enumerate(obj.resources):
+                    while len(steps) <= i:
+                        steps.append([])
+                    steps[i].append((obj, group))
+            else:
+                steps[0].append((obj, None))
+        out.extend(step for step in steps if step)
+    return out
+
+def select(obj, group, shard, count, store=None):
+    "Returns terminator object with resources of the planned object's group belonging to the shard"
+    part = terminator.terminator(obj.driver, obj.include, obj.exclude, obj.region, None, store)
+    if group is None:
+        part.resources = [res for res in obj.resources if shard_of(res, count) == shard]
+    else:
+        selected = [res for res in obj.resources[group] if shard_of(res, count) == shard]
+        if selected:
+            part.resources = dict((key, selected if key == group else []) for key in obj.resources)
+    return part
+
+def mark(directory, name, data=""):
+    "Create the file in the shared directory at once"
+    temp = os.path.join(directory, ".%s.%d.tmp" % (name, os.getpid()))
+    with open(temp, "w") as f:
+        f.write(data)
+    os.replace(temp, os.path.join(directory, name))
+    return True
+
+def failed(directory):
+    "Returns the list of shards which failed"
+    return sorted(int(name.split('-')[1]) for name in os.listdir(directory) if name.startswith('failed-'))
+
+def wait_for(directory, names, timeout=default_timeout):
+    "Wait until every file exists in the shared directory, fails if any shard failed or the timeout passes"
+    deadline = time.monotonic() + timeout
+    while True:
+        if all(os.path.exists(os.path.join(directory, name)) for name in names):
+            return True
+        if failed(directory):
+            raise RuntimeError("Shards %s failed" % (', '.join(str(shard) for shard in failed(directory))))
+        if time.monotonic() >= deadline:
+            raise RuntimeError("Timed out waiting for other shards")
+        time.sleep(poll_interval)
+
+def barrier(directory, stage, shard, count, timeout=default_timeout):
+    "Mark the shard done with the stage and wait until every shard is"
+    mark(directory, "done-%d-%d" % (stage, shard))
+    return wait_for(directory, ["done-%d-%d" % (stage, i) for i in range(count)], timeout)
+
+def process_shard(task):
+    "Worker process: process resources of the shard stage by stage, waiting for every shard at the barriers, and write the partial report"
+    path, shard, count, directory, workers, dry_run, inventory, wait, engine, output = task
+    out = {'Shard': shard, 'Report': {}, 'Error': '', 'Stats': None}
+    # Only calls made for the shard are reported
+    stats.reset()
+    try:
+        objects, regions = plan.get_objects(plan.load(path), [], [])
+        store = accounts.open_inventory(inventory)
+        terminator.executor.set_pool_size(workers)
+        writer = None
+        if output:
+            from terminator import report
+            writer = report.open_writer(output)
+        steps = stages(objects.values())
+        parts = []
+        for i, step in enumerate(steps):
+            batch = [select(obj, group, shard, count, store) for obj, group in step]
+            if engine == "asyncio":
+                from terminator import aio
+                aio.process_all({None: batch}, dry_run, output=writer)
+            else:
+                terminator.process_all({None: batch}, dry_run, writer)
+            # Entries are kept as soon as the step is done, so a failed shard still reports them
+            for part in batch:
+                if part.has_resources():
+                    out['Report'].setdefault((part.region, part.driver), []).extend(part.report)
+            parts.extend(batch)
+            if i < len(steps) - 1:
+                barrier(directory, i, shard, count)
+        if wait and not dry_run:
+            terminator.waiter.wait_all(parts)
+    except Exception as e:
+        out['Error'] = str(e)
+        # Other shards stop waiting at the barriers
+        mark(directory, "failed-%d" % (shard), out['Error'])
+    if stats.enabled():
+        out['Stats'] = stats.snapshot()
+    write_report(directory, out)
+    return out
+
+def write_report(directory, record):
+    "Write the partial report of the shard to the shared directory"
+    data = {
+        'Shard': record['Shard'],
+        'Error': record['Error'],
+        'Stats': record['Stats'],
+        'Report': [
+            {'Region': region, 'Driver': driver, 'Entries': [entry.to_dict() for entry in entries]}
+            for (region, driver), entries in record['Report'].items()
+        ],
+    }
+    return mark(directory, "report-%d.json" % (record['Shard']), json.dumps(data))
+
+def read_report(directory, shard):
+    "Returns the partial report of the shard written by write_report()"
+    with open(os.path.join(directory, "report-%d.json" % (shard))) as f:
+        data = json.load(f)
+    data['Report'] = dict(
+        ((item['Region'], item['Driver']), [records.from_dict(entry) for entry in item['Entries']])
+        for item in data['Report']
+    )
+    return data
+
+def merge(directory, count, timeout=default_timeout):
+    "Wait for partial reports of all shards and return them in shard order"
+    deadline = time.monotonic() + timeout
+    names = ["report-%d.json" % (shard) for shard in range(count)]
+    while not all(os.path.exists(os.path.join(directory, name)) for name in names):
+        if time.monotonic() >= deadline:
+            raise RuntimeError("Timed out waiting for reports of the shards")
+        time.sleep(poll_interval)
+    return [read_report(directory, shard) for shard in range(count)]
+
+def process_shards(path, count, directory, workers=1, dry_run=True, inventory=None, wait=False, engine="threads", output=None):
+    "Process every shard of the plan in a local worker process, returns the partial reports"
+    # Every run gets a new directory, files of an earlier run would release the barriers early
+    os.makedirs(directory)
+    tasks = [(path, shard, count, directory, workers, dry_run, inventory, wait, engine, output) for shard in range(count)]
+    # Every shard gets its own process, shards wait for each other at the barriers
+    accounts.run_workers(process_shard, tasks, count)
+    return merge(directory, count)
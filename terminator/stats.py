@@ -0,0 +1,295 @@
+import json
+import os
+import threading
+import time
+from terminator import clients
+from terminator import ratelimit
+from terminator.errors import error_code
+
+# Upper bounds in seconds of the call latency histogram buckets
+buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+percentiles = [50, 90, 99] # Latency percentiles shown in the summary
+
+_prefix = "aws_terminator" # Prefix of Prometheus metric names
+
+_enabled = False
+_calls = {}
+_drivers = {}
+_lock = threading.Lock()
+
+class call_stats(object):
+    "Counters and latencies of calls of a single service operation"
+
+    def __init__(self):
+        "Constructor"
+        self.calls = 0
+        self.errors = 0
+        self.throttles = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latencies = []
+
+    def add(self, latency, error=None, retries=0, bytes_sent=0, bytes_received=0):
+        "Count a finished call"
+        self.calls += 1
+        if error:
+            self.errors += 1
+            if error in ratelimit.throttling_errors:
+                self.throttles += 1
+        self.retries += retries
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+        self.latencies.append(latency)
+
+    def merge(self, other):
+        "Add the counters and latencies of other"
+        self.calls += other.calls
+        self.errors += other.errors
+        self.throttles += other.throttles
+        self.retries += other.retries
+        self.bytes_sent += other.bytes_sent
+        self.bytes_received += other.bytes_received
+        self.latencies.extend(other.latencies)
+
+    def percentile(self, p):
+        "Returns the latency below which p percent of the calls finished"
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100.0))]
+
+    def histogram(self):
+        "Returns cumulative counts of calls finished within every bucket bound"
+        return [len([latency for latency in self.latencies if latency <= bound]) for bound in buckets]
+
+def enabled():
+    "Returns True if calls are being recorded"
+    return _enabled
+
+def enable():
+    "Record every call of clients created by terminator.clients"
+    global _enabled
+    with _lock:
+        if _enabled:
+            return True
+        _enabled = True
+    clients.add_hook('before-parameter-build', _call_started)
+    clients.add_hook('request-created', _request_created)
+    clients.add_hook('after-call', _call_finished)
+    clients.add_hook('after-call-error', _call_failed)
+    return True
+
+def reset():
+    "Forget everything recorded so far"
+    with _lock:
+        _calls.clear()
+        _drivers.clear()
+    return True
+
+def _call_started(params, model, context, **kwargs):
+    context['stats_operation'] = (model.service_model.service_name, model.name)
+    context['stats_started'] = time.perf_counter()
+
+def _request_created(request, **kwargs):
+    # Retried requests are signed again, the size of the body is counted once per call
+    context = getattr(request, 'context', None)
+    if context is None or 'stats_bytes_sent' in context:
+        return
+    body = request.body
+    if isinstance(body, (bytes, str)):
+        context['stats_bytes_sent'] = len(body)
+
+def _response_size(http_response):
+    length = http_response.headers.get('content-length') if http_response.headers else None
+    if length is not None:
+        return int(length)
+    # The body read by botocore, async responses do not read it again
+    content = getattr(http_response, '_content', None)
+    if isinstance(content, bytes):
+        return len(content)
+    return 0
+
+def _call_finished(http_response, parsed, model, context, **kwargs):
+    error = None
+    if http_response.status_code >= 300:
+        error = parsed.get('Error', {}).get('Code') or str(http_response.status_code)
+    retries = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+    record(context, error, retries, _response_size(http_response))
+
+def _call_failed(exception, context, **kwargs):
+    record(context, error_code(exception) or exception.__class__.__name__)
+
+def record(context, error=None, retries=0, bytes_received=0):
+    "Count the call started with the context"
+    started = context.get('stats_started')
+    if started is None:
+        return False
+    latency = time.perf_counter() - started
+    key = context['stats_operation']
+    with _lock:
+        if key not in _calls:
+            _calls[key] = call_stats()
+        _calls[key].add(latency, error, retries, context.get('stats_bytes_sent', 0), bytes_received)
+    return True
+
+def add_time(driver, phase, seconds):
+    "Add wall time the driver spent in the phase, prepare or process"
+    if not _enabled:
+        return False
+    with _lock:
+        _drivers[(driver, phase)] = _drivers.get((driver, phase), 0.0) + seconds
+    return True
+
+class timer(object):
+    "Context manager adding the wall time of the block to the driver's phase"
+
+    def __init__(self, driver, phase):
+        "Constructor"
+        self.driver = driver
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        add_time(self.driver, self.phase, time.perf_counter() - self.started)
+        return False
+
+def snapshot():
+    "Returns everything recorded so far, so it can leave the worker process and be merged"
+    with _lock:
+        return {
+            'Calls': [(key, vars(stats).copy()) for key, stats in _calls.items()],
+            'Drivers': list(_drivers.items()),
+        }
+
+def merge(data):
+    "Add the snapshot() of a worker process"
+    if not data:
+        return False
+    with _lock:
+        for key, values in data['Calls']:
+            key = tuple(key)
+            other = call_stats()
+            other.__dict__.update(values)
+            if key not in _calls:
+                _calls[key] = call_stats()
+            _calls[key].merge(other)
+        for key, seconds in data['Drivers']:
+            key = tuple(key)
+            _drivers[key] = _drivers.get(key, 0.0) + seconds
+    return True
+
+def _format_bytes(count):
+    for unit in ('B', 'KB', 'MB'):
+        if count < 1024:
+            return "%d%s" % (count, unit)
+        count //= 1024
+    return "%dGB" % (count)
+
+def print_summary():
+    "Print call counts, errors and latencies of every service operation and the wall time of every driver"
+    with _lock:
+        calls = sorted(_calls.items())
+        drivers = sorted(_drivers.items())
+    print("---Terminator stats---")
+    header = "%-22s %-34s %7s %7s %9s %7s" % ("Service", "Operation", "Calls", "Errors", "Throttled", "Retries")
+    for p in percentiles:
+        header += " %8s" % ("p%d" % (p))
+    header += " %8s %9s %9s" % ("Max", "Sent", "Received")
+    print(header)
+    for (service, operation), stats in calls:
+        line = "%-22s %-34s %7d %7d %9d %7d" % (service, operation, stats.calls, stats.errors, stats.throttles, stats.retries)
+        for p in percentiles:
+            line += " %7.0fms" % (stats.percentile(p) * 1000)
+        line += " %7.0fms %9s %9s" % (max(stats.latencies) * 1000, _format_bytes(stats.bytes_sent), _format_bytes(stats.bytes_received))
+        print(line)
+    if drivers:
+        print("Drivers:")
+        for (driver, phase), seconds in drivers:
+            print("  %-15s %-8s %.2fs" % (driver, phase, seconds))
+    return True
+
+def to_dict():
+    "Returns everything recorded so far as JSON serializable dict"
+    out = {'calls': [], 'drivers': []}
+    with _lock:
+        for (service, operation), stats in sorted(_calls.items()):
+            entry = {
+                'service': service,
+                'operation': operation,
+                'calls': stats.calls,
+                'errors': stats.errors,
+                'throttles': stats.throttles,
+                'retries': stats.retries,
+                'bytes_sent': stats.bytes_sent,
+                'bytes_received': stats.bytes_received,
+                'latency_max': max(stats.latencies) if stats.latencies else 0.0,
+                'latency_sum': sum(stats.latencies),
+            }
+            for p in percentiles:
+                entry['latency_p%d' % (p)] = stats.percentile(p)
+            out['calls'].append(entry)
+        for (driver, phase), seconds in sorted(_drivers.items()):
+            out['drivers'].append({'driver': driver, 'phase': phase, 'seconds': seconds})
+    return out
+
+def _labels(**labels):
+    return "{%s}" % (','.join('%s="%s"' % (key, value) for key, value in sorted(labels.items())))
+
+def to_prometheus():
+    "Returns everything recorded so far in Prometheus text exposition format"
+    counters = [
+        ('api_calls_total', 'AWS API calls', 'calls'),
+        ('api_errors_total', 'AWS API calls failed, including throttled calls', 'errors'),
+        ('api_throttles_total', 'AWS API calls throttled', 'throttles'),
+        ('api_retries_total', 'AWS API call attempts retried by botocore', 'retries'),
+        ('api_request_bytes_total', 'Bytes of AWS API request bodies', 'bytes_sent'),
+        ('api_response_bytes_total', 'Bytes of AWS API response bodies', 'bytes_received'),
+    ]
+    lines = []
+    with _lock:
+        calls = sorted(_calls.items())
+        drivers = sorted(_drivers.items())
+    for name, description, attribute in counters:
+        lines.append("# HELP %s_%s %s" % (_prefix, name, description))
+        lines.append("# TYPE %s_%s counter" % (_prefix, name))
+        for (service, operation), stats in calls:
+            lines.append("%s_%s%s %d" % (_prefix, name, _labels(service=service, operation=operation), getattr(stats, attribute)))
+
+    name = "%s_api_call_duration_seconds" % (_prefix)
+    lines.append("# HELP %s Latency of AWS API calls" % (name))
+    lines.append("# TYPE %s histogram" % (name))
+    for (service, operation), stats in calls:
+        for bound, count in zip(buckets, stats.histogram()):
+            lines.append("%s_bucket%s %d" % (name, _labels(service=service, operation=operation, le=repr(bound)), count))
+        lines.append("%s_bucket%s %d" % (name, _labels(service=service, operation=operation, le="+Inf"), stats.calls))
+        lines.append("%s_sum%s %f" % (name, _labels(service=service, operation=operation), sum(stats.latencies)))
+        lines.append("%s_count%s %d" % (name, _labels(service=service, operation=operation), stats.calls))
+
+    name = "%s_driver_seconds" % (_prefix)
+    lines.append("# HELP %s Wall time of driver phases" % (name))
+    lines.append("# TYPE %s gauge" % (name))
+    for (driver, phase), seconds in drivers:
+        lines.append("%s%s %f" % (name, _labels(driver=driver, phase=phase), seconds))
+
+    name = "%s_last_run_timestamp_seconds" % (_prefix)
+    lines.append("# HELP %s Time the statistics were written" % (name))
+    lines.append("# TYPE %s gauge" % (name))
+    lines.append("%s %f" % (name, time.time()))
+    return "\n".join(lines) + "\n"
+
+def write(path):
+    "Write everything recorded so far to the file, in Prometheus text format if its name ends with .prom, or as JSON"
+    if path.endswith(".prom"):
+        data = to_prometheus()
+    else:
+        data = json.dumps(to_dict(), indent=2) + "\n"
+    # The file is replaced at once, so collectors never read it half written
+    temp = "%s.%d.tmp" % (path, os.getpid())
+    with open(temp, "w") as f:
+        f.write(data)
+    os.replace(temp, path)
+    return True
@@ -0,0 +1,95 @@
+import concurrent.futures
+from terminator import clients
+from terminator import pagination
+
+def parse_tags(selectors):
+    "Returns TagFilters for the list of key=value selectors, values of the same key are alternatives"
+    values = {}
+    for selector in selectors:
+        key, sep, value = selector.partition('=')
+        values.setdefault(key, [])
+        if sep:
+            values[key].append(value)
+    out = []
+    for key in values.keys():
+        if values[key]:
+            out.append({'Key': key, 'Values': values[key]})
+        else:
+            out.append({'Key': key})
+    return out
+
+def parse_arn(arn):
+    "Returns resource type (as used by ResourceTypeFilters) and resource ID of the ARN"
+    parts = arn.split(':', 5)
+    service, resource = parts[2], parts[5]
+    if service == 's3':
+        return service, resource
+    resource = resource.lstrip('/')
+    separators = [i for i in (resource.find('/'), resource.find(':')) if i != -1]
+    if not separators:
+        return service, resource
+    i = min(separators)
+    return "%s:%s" % (service, resource[:i]), resource[i+1:]
+
+def get_resources(region, tag_filters, resource_types, session=None):
+    "Yield ARNs and tags of all resources of the types matching tag filters in the region"
+    client = clients.get_client('resourcegroupstaggingapi', region, session)
+    for mapping in pagination.paginate(
+        client,
+        'get_resources',
+        'ResourceTagMappingList',
+        page_size=100,
+        TagFilters=tag_filters,
+        ResourceTypeFilters=resource_types
+    ):
+        tags = dict((tag['Key'], tag['Value']) for tag in mapping.get('Tags', []))
+        yield mapping['ResourceARN'], tags
+
+def discover(objects, selectors, regions=[None], workers=1, session=None):
+    "Discover resources of terminator objects with one tag listing per region, returns resources keyed like objects"
+    tag_filters = parse_tags(selectors)
+    found = dict((key, []) for key in objects.keys())
+    seen = set()
+
+    def discover_region(region):
+        "Route every tagged ARN of the region to the terminator object owning it"
+        routes = {}
+        for key, obj in objects.items():
+            # Global resources are looked up in every region
+            if obj.region == region or obj.region is None:
+                for resource_type in obj.drv.arn_types:
+                    routes[resource_type] = key
+        out = []
+        for arn, tags in get_resources(region, tag_filters, sorted(routes.keys()), session):
+            resource_type, resource_id = parse_arn(arn)
+            if resource_type not in routes:
+                continue
+            key = routes[resource_type]
+            resource = objects[key].drv.resource_from_arn(resource_id, arn, tags)
+            if resource is not None:
+                out.append((key, resource))
+        return out
+
+    workers = max(1, min(workers, len(regions)))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(discover_region, regions):
+            for key, resource in result:
+                obj = objects[key]
+                # Aliases, versions and the same global resource seen in several regions are listed once
+                identity = (key, resource.key())
+                if identity in seen:
+                    continue
+                # Tagged resources are narrowed down by include and exclude patterns if any given
+                if obj.match and not obj.match(resource.name):
+                    continue
+                seen.add(identity)
+                found[key].append(resource)
+
+    out = {}
+    for key, obj in objects.items():
+        if hasattr(obj.drv, 'group_resources'):
+            obj.resources = obj.drv.group_resources(found[key])
+        else:
+            obj.resources = found[key]
+        out[key] = obj.resources
+    return out
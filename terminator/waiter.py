@@ -0,0 +1,55 @@
+import time
+from terminator import executor
+
+default_timeout = 900 # Seconds to wait for removed resources to disappear before reporting a timeout
+initial_delay = 2.0 # Seconds before the first status check
+max_delay = 30.0 # Status checks are never further apart than this number of seconds
+backoff = 1.5 # The delay between status checks is multiplied by this factor after every check
+
+def is_async(obj):
+    "Returns True if removal of the object's resources completes after the removal call returns"
+    return hasattr(obj.drv, 'existing')
+
+def pending(obj):
+    "Returns report entries of resources removed but still existing"
+    return [entry for entry in obj.report if entry.result == 'deleting']
+
+def check(obj):
+    "Mark report entries of resources which are gone as removed, returns the number of entries still pending"
+    entries = pending(obj)
+    try:
+        existing = obj.drv.existing(entries, obj.region, obj.session)
+    except Exception:
+        # The status is checked again after the next delay
+        return len(entries)
+    remaining = set(id(entry) for entry in existing)
+    for entry in entries:
+        if id(entry) not in remaining:
+            entry.result = "success"
+    return len(remaining)
+
+def wait_all(objects, timeout=default_timeout):
+    "Wait until resources removed by asynchronous drivers are gone, all drivers are checked on a shared schedule"
+    objects = [obj for obj in objects if is_async(obj)]
+    for obj in objects:
+        for entry in obj.report:
+            if entry.result == "success":
+                entry.result = "deleting"
+
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    waiting = [obj for obj in objects if pending(obj)]
+    while waiting:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        time.sleep(min(delay, deadline - now))
+        delay = min(max_delay, delay * backoff)
+        # Every driver checks all of its pending resources with batched calls
+        executor.bounded_map(check, waiting, len(waiting))
+        waiting = [obj for obj in waiting if pending(obj)]
+
+    for obj in waiting:
+        for entry in pending(obj):
+            entry.result = "timeout"
+    return objects